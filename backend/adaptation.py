@@ -2,6 +2,9 @@
 
 import numpy as np
 
+from backend.metrics import adaptive_matches_total
+from backend.tracing import traced
+
 
 class AdaptiveLayer:
     def __init__(self, num_params=13, max_memory=100):
@@ -50,6 +53,7 @@ class AdaptiveLayer:
         if len(self.memory) > self.max_memory:
             self.memory.pop(0)
 
+    @traced("adaptive_layer.adjust")
     def adjust(self, predicted_params, features):
         """
         Adjust prediction based on most similar past case
@@ -71,6 +75,7 @@ class AdaptiveLayer:
             return predicted_params
 
         # apply correction
+        adaptive_matches_total.inc()
         adjusted = predicted_params + best_case["diff"]
 
         # clamp values
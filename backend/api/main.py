@@ -2,19 +2,31 @@ from dotenv import load_dotenv
 import os
 load_dotenv(os.path.join(os.path.dirname(__file__), "..", ".env"))
 
-# Download models from Supabase if not present locally
-from backend.startup import download_models
-download_models()
-
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, Response, FileResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
-import os, shutil, uuid
-from backend.evaluate import evaluate_transformer
-from backend.image_features import extract_image_features
+import os, asyncio
+# only the OpenCV/NumPy side is imported here: torch, torchvision and sklearn
+# (backend.evaluate, backend.model_registry, backend.image_context) are imported
+# by the model startup thread and /predict, so the feature endpoints boot fast
+from backend.image_features import (
+    extract_image_features_from_bytes,
+    compute_image_hash,
+    decode_image_bytes,
+    resize_for_features,
+)
+from backend.executors import run_inference, run_features, configure_threads, shutdown as shutdown_executors
 from backend.similarity import verify_transformer_images
+from backend import inference_workers
+from backend.gradcam_jobs import gradcam_jobs
+from backend.prediction_cache import content_hash, prediction_cache
+from backend.startup import readiness
+from backend.metrics import metrics, stage_seconds, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from backend import tracing
+from core import config as cfg
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -22,6 +34,35 @@ load_dotenv()
 
 app = FastAPI()
 
+
+def _load_inference():
+    if cfg.INFERENCE_PROCESSES > 0:
+        # load once, share the weights, fork the inference worker processes
+        return inference_workers.start(cfg.INFERENCE_PROCESSES) is not None
+    # Build both networks once; every /predict reuses the same eval-mode modules
+    from backend.model_registry import model_registry
+
+    return model_registry.load()
+
+
+@app.on_event("startup")
+def load_models():
+    cfg.apply_deployment_profile()  # backend/autotune.py settings for this host
+    configure_threads(torch_threads=cfg.SERVE_MODELS)
+    if not cfg.SERVE_MODELS:
+        print("ℹ SERVE_MODELS=0: feature-only worker, models are not loaded")
+        return
+    # download (Supabase / mirror) + load + warm in the background: cheap endpoints
+    # are served immediately, GET /ready reports when /predict can run
+    readiness.start(_load_inference)
+
+
+@app.on_event("shutdown")
+def stop_workers():
+    inference_workers.shutdown(wait=False)
+    gradcam_jobs.shutdown(wait=False)
+    shutdown_executors(wait=False)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -30,12 +71,51 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# now no output folder needed for holding gradcam images 
-# OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "outputs")
-# app.mount("/outputs", StaticFiles(directory=OUTPUT_DIR), name="outputs")
+# gradcam images only live on disk with the "local" storage backend (Supabase otherwise)
+if cfg.ARTIFACT_STORAGE == "local":
+    os.makedirs(cfg.GRADCAM_DIR, exist_ok=True)
+    # only the gradcam folder: OUTPUT_ROOT also holds checkpoints and logs
+    app.mount("/outputs/gradcam", StaticFiles(directory=cfg.GRADCAM_DIR), name="gradcam")
 
-UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "temp_uploads")
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+async def read_uploads(files):
+    """
+    Read each UploadFile's (spooled) buffer into memory: [(filename, bytes), ...].
+    Images are decoded straight from these bytes — nothing is written to temp files.
+    """
+    with stage_seconds.time(stage="upload_read"), tracing.span("read_uploads"):
+        return [(file.filename, await file.read()) for file in files]
+
+
+def _cached_features(data):
+    # features of these exact bytes, shared with /predict through the prediction cache
+    image_hash = content_hash(data)
+    features = prediction_cache.get_features(image_hash)
+    if features is None:
+        features = extract_image_features_from_bytes(data, cfg.DECODE_MIN_SIZE)
+        prediction_cache.put_features(image_hash, features)
+    return features
+
+
+def _features_or_none(filename, data):
+    try:
+        return _cached_features(data)
+    except Exception as e:
+        print(f"⚠️ Failed to extract features from {filename}: {e}")
+        return None
+
+
+def _hash_or_none(filename, data):
+    # Extract hash only (fast)
+    try:
+        cached = prediction_cache.get_features(content_hash(data))
+        if cached is not None:
+            return cached["imageHash"]
+        image = decode_image_bytes(data, cfg.DECODE_MIN_SIZE)
+        return compute_image_hash(resize_for_features(image))
+    except Exception as e:
+        print(f"⚠️ Failed to compute hash for {filename}: {e}")
+        return None
 
 
 class VerifyRequest(BaseModel):
@@ -44,11 +124,14 @@ class VerifyRequest(BaseModel):
 
 @app.post("/verify-transformer")
 async def verify_transformer(
+    request: Request,
+    response: Response,
     files: list[UploadFile] = File(...),
     stored_features: str = Form(...),  # JSON string of stored features
 ):
     """
     Verify that uploaded images match the stored transformer features.
+    With cfg.REQUEST_PROFILING, "X-Profile: 1" (or ?profile=1) saves a trace (backend/tracing.py).
     
     Returns:
         {
@@ -60,6 +143,13 @@ async def verify_transformer(
             "details": dict
         }
     """
+    if tracing.requested(request):
+        with tracing.profile_request("verify-transformer", response):
+            return await _verify_transformer(files, stored_features)
+    return await _verify_transformer(files, stored_features)
+
+
+async def _verify_transformer(files, stored_features):
     import json
     
     # Parse stored features from JSON string
@@ -79,48 +169,28 @@ async def verify_transformer(
             "details": {"reason": "no_stored_features"}
         }
     
-    # Save uploaded files temporarily and extract features
-    saved_paths = []
-    try:
-        for file in files:
-            filename = f"verify_{uuid.uuid4().hex}_{file.filename}"
-            path = os.path.join(UPLOAD_DIR, filename)
-            with open(path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            saved_paths.append(path)
-        
-        # Extract features from new images
-        new_features_list = []
-        for path in saved_paths:
-            try:
-                features = extract_image_features(path)
-                new_features_list.append(features)
-            except Exception as e:
-                print(f"⚠️ Failed to extract features from {path}: {e}")
-        
-        # If no valid features extracted, reject
-        if not new_features_list:
-            return {
-                "verified": False,
-                "score": 0.0,
-                "status": "reject",
-                "message": "Could not extract features from uploaded images.",
-                "requiresConfirmation": False,
-                "details": {"reason": "feature_extraction_failed"}
-            }
-        
-        # Compare features
-        result = verify_transformer_images(new_features_list, stored_features_list)
-        
-        return result
-        
-    finally:
-        # Clean up temporary verification files
-        for path in saved_paths:
-            try:
-                os.remove(path)
-            except:
-                pass
+    # Extract features from new images (decoded from the upload buffers, on the feature pool)
+    uploads = await read_uploads(files)
+    new_features_list = await asyncio.gather(*(
+        run_features(_features_or_none, filename, data) for filename, data in uploads
+    ))
+    new_features_list = [f for f in new_features_list if f is not None]
+    
+    # If no valid features extracted, reject
+    if not new_features_list:
+        return {
+            "verified": False,
+            "score": 0.0,
+            "status": "reject",
+            "message": "Could not extract features from uploaded images.",
+            "requiresConfirmation": False,
+            "details": {"reason": "feature_extraction_failed"}
+        }
+    
+    # Compare features
+    result = await run_features(verify_transformer_images, new_features_list, stored_features_list)
+    
+    return result
 
 
 @app.post("/extract-hashes")
@@ -137,69 +207,60 @@ async def extract_hashes(
             "count": int
         }
     """
-    from backend.image_features import compute_image_hash
-    import cv2
+    uploads = await read_uploads(files)
+    hashes = await asyncio.gather(*(
+        run_features(_hash_or_none, filename, data) for filename, data in uploads
+    ))
+    hashes = [h for h in hashes if h is not None]
     
-    hashes = []
-    saved_paths = []
-    
-    try:
-        for file in files:
-            filename = f"hash_{uuid.uuid4().hex}_{file.filename}"
-            path = os.path.join(UPLOAD_DIR, filename)
-            with open(path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            saved_paths.append(path)
-            
-            # Extract hash only (fast)
-            try:
-                image = cv2.imread(path)
-                if image is not None:
-                    image_resized = cv2.resize(image, (256, 256))
-                    hash_value = compute_image_hash(image_resized)
-                    hashes.append(hash_value)
-            except Exception as e:
-                print(f"⚠️ Failed to compute hash for {file.filename}: {e}")
-        
-        return {
-            "hashes": hashes,
-            "count": len(hashes)
-        }
-        
-    finally:
-        # Clean up
-        for path in saved_paths:
-            try:
-                os.remove(path)
-            except:
-                pass
+    return {
+        "hashes": hashes,
+        "count": len(hashes)
+    }
 
 
 @app.post("/predict")
 async def predict(
+    request: Request,
+    response: Response,
     transformer_id: str = Form(...),
     location: str = Form(...),
     date: str = Form(...),
     time: str = Form(...),
     files: list[UploadFile] = File(...),
 ):
+    # With cfg.REQUEST_PROFILING, "X-Profile: 1" (or ?profile=1) saves a trace (backend/tracing.py)
+    if tracing.requested(request):
+        with tracing.profile_request("predict", response):
+            return await _predict(files)
+    return await _predict(files)
+
+
+async def _predict(files):
     import json
     import numpy as np
     from backend.adjustment_layer import apply_adjustments
     from backend.adaptation import adaptive_layer
 
-    saved_paths = []
+    if not cfg.SERVE_MODELS:
+        raise HTTPException(status_code=503, detail="Models are disabled on this worker (SERVE_MODELS=0)")
+    if not readiness.ready:
+        raise HTTPException(status_code=503, detail="Models are still loading, see GET /ready")
 
-    # --- Save uploaded files ---
-    for file in files:
-        filename = f"{uuid.uuid4().hex}_{file.filename}"
-        path = os.path.join(UPLOAD_DIR, filename)
-        with open(path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        saved_paths.append(path)
+    from backend.evaluate import evaluate_transformer
+    from backend.image_context import ImageContext
 
     # --- Step 1: Model Prediction ---
-    result = evaluate_transformer(saved_paths)
+    # each image is decoded once, straight from the upload buffer; its tensor,
+    # features and overlay base are shared by all stages
+    images = [ImageContext.from_bytes(data, name=filename) for filename, data in await read_uploads(files)]
+    if tracing.active():
+        # profiled: in this process, where torch.profiler and the span tracer can see it
+        result = await run_inference(tracing.with_torch_profiler(evaluate_transformer), images)
+    elif inference_workers.is_running():
+        result = await inference_workers.evaluate(images)
+    else:
+        result = await run_inference(evaluate_transformer, images)
 
     # --- Step 2: Apply GLOBAL learned adjustments ---
     try:
@@ -213,12 +274,12 @@ async def predict(
 
     # --- Step 3: Apply ADAPTIVE (case-based) learning ---
     try:
-        if "paramsScores" in result and len(saved_paths) > 0:
+        if result.get("paramsScores") and result.get("providedImages"):
             param_keys = list(result["paramsScores"].keys())
             param_values = np.array(list(result["paramsScores"].values()), dtype=float)
 
-            # Extract features from first image
-            features = extract_image_features(saved_paths[0])
+            # Features of the first PMT image, already extracted by evaluate_transformer
+            features = result["providedImages"][0]
 
             adjusted_values = adaptive_layer.adjust(param_values, features)
 
@@ -234,6 +295,83 @@ async def predict(
     return result
 
 
+@app.get("/ready")
+async def ready():
+    """
+    Readiness probe: 200 once the models are downloaded, verified, loaded and warm, else 503.
+
+    Returns:
+        {
+            "ready": bool,
+            "status": "starting" | "downloading" | "loading" | "ready" | "failed",
+            "error": str | None,
+            "attempt": int,           # download + load attempts so far
+            "retry_in": float | None  # seconds until the next attempt after a failure
+        }
+    """
+    state = readiness.snapshot()
+    if not state["ready"]:
+        return JSONResponse(status_code=503, content=state)
+    return state
+
+
+@app.get("/traces/{name}")
+async def get_trace(name: str):
+    """Download a profiling trace named by a profiled request's X-Profile-Trace header."""
+    path = os.path.join(cfg.TRACE_DIR, os.path.basename(name))
+    if not cfg.REQUEST_PROFILING or not name.endswith(".json") or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Unknown trace")
+    return FileResponse(path, media_type="application/json")
+
+
+@app.get("/gradcam/{job_id}")
+async def gradcam_status(job_id: str):
+    """
+    Poll a background Grad-CAM job returned in /predict's "gradCamJobs".
+
+    Returns:
+        {
+            "jobId": str,
+            "status": "pending" | "done" | "failed",
+            "url": str | None,
+            "error": str | None
+        }
+    """
+    job = gradcam_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired Grad-CAM job")
+
+    return {"jobId": job_id, **job}
+
+
+@app.get("/cache-stats")
+async def cache_stats():
+    """
+    Prediction cache counters (this process; each INFERENCE_PROCESSES worker keeps its own).
+
+    Returns:
+        {
+            "enabled": bool,
+            "entries": int,
+            "maxEntries": int,
+            "hits": int,
+            "misses": int,
+            "hitRate": float,
+            "diskDir": str | None
+        }
+    """
+    return prediction_cache.stats()
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """
+    Prometheus text exposition: per-stage /predict latency histograms, image / cache /
+    adaptive-layer counters, queue depths and model memory (see backend/metrics.py).
+    """
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.post("/submit-corrections")
 async def submit_corrections(
     transformer_id: str = Form(...),
@@ -244,8 +382,6 @@ async def submit_corrections(
     import json
     import os
     import numpy as np
-    import uuid
-    import shutil
     from datetime import datetime
     from backend.adaptation import adaptive_layer
 
@@ -279,7 +415,7 @@ async def submit_corrections(
     # ✅ LEVEL 2: STORE HISTORY
     # ==============================
 
-    ADJUSTMENT_FILE = os.path.join(os.path.dirname(__file__), "adjustments.json")
+    ADJUSTMENT_FILE = os.path.join(cfg.ADJUSTMENTS_DIR, "adjustments.json")
 
     try:
         if os.path.exists(ADJUSTMENT_FILE):
@@ -308,7 +444,7 @@ async def submit_corrections(
     # ✅ LEVEL 3: GLOBAL LEARNING
     # ==============================
 
-    LEARNED_FILE = os.path.join(os.path.dirname(__file__), "learned_adjustments.json")
+    LEARNED_FILE = os.path.join(cfg.ADJUSTMENTS_DIR, "learned_adjustments.json")
 
     try:
         if os.path.exists(LEARNED_FILE):
@@ -344,17 +480,9 @@ async def submit_corrections(
 
         features = None
 
-        # Extract features from first image
+        # Extract features from first image (decoded in memory, no temp file)
         if files:
-            temp_path = os.path.join(os.path.dirname(__file__), f"temp_{uuid.uuid4().hex}.jpg")
-
-            with open(temp_path, "wb") as buffer:
-                shutil.copyfileobj(files[0].file, buffer)
-
-            try:
-                features = extract_image_features(temp_path)
-            finally:
-                os.remove(temp_path)
+            features = await run_features(_cached_features, await files[0].read())
 
         # Store in adaptive memory
         if features is not None:
@@ -0,0 +1,231 @@
+# backend/autotune.py
+"""
+CPU inference autotuner: measures this host and writes the deployment profile the API
+applies at startup (cfg.DEPLOYMENT_PROFILE, see cfg.apply_deployment_profile).
+
+    python backend/autotune.py                        # full sweep → outputs/deployment_profile.json
+    python backend/autotune.py --quick --dry-run      # print the choice, write nothing
+    python backend/autotune.py --backends torch onnx torch+compile --threads 2 4 8
+
+Swept through the same registry forwards /predict uses (cfg.MODEL_NAME health model +
+PMT classifier, the loaded checkpoints in cfg.CHECKPOINT_DIR):
+
+    backend       torch, torch+freeze, onnx (needs backend/onnx_backend.py exports), torch+compile
+    torch threads intra-op threads (also the ONNX Runtime session threads)
+    batch size    images per forward → INFERENCE_BATCH_SIZE and MICROBATCH_MAX_SIZE
+    cv2 threads   OpenCV threads, on JPEG decode + features from FEATURE_WORKERS threads
+
+The fastest (backend, threads) by peak images/s wins; within TIE_TOLERANCE fewer threads
+are preferred. The batch size is the smallest one within TIE_TOLERANCE of that peak (lower
+latency per request). Tune with the INFERENCE_WORKERS / INFERENCE_PROCESSES the node
+will serve with in mind: each worker runs its forwards with this many threads.
+INFERENCE_PROCESSES is recorded in the profile (the API ignores a profile tuned for
+another value); with INFERENCE_PROCESSES > 0 only the eager torch backend is swept,
+the only one forked workers can share.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+import numpy as np
+
+from core import config as cfg
+from backend.benchmark import timeit, synthetic_image, _git_commit
+
+BACKENDS = ("torch", "torch+freeze", "onnx", "torch+compile")
+DEFAULT_BACKENDS = ("torch", "torch+freeze", "onnx")
+DEFAULT_BATCH_SIZES = (1, 4, 8, 16, 32)
+TIE_TOLERANCE = 0.05
+
+
+def thread_candidates():
+    """1, 2, 4, ... up to the CPU count (which is always included)."""
+    cpus = os.cpu_count() or 1
+    candidates = {cpus}
+    n = 1
+    while n < cpus:
+        candidates.add(n)
+        n *= 2
+    return sorted(candidates)
+
+
+def host_info():
+    info = {"cpu_count": os.cpu_count(), "machine": platform.machine(), "processor": platform.processor()}
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    info["processor"] = line.split(":", 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    return info
+
+
+# -------------------------
+# Model sweep
+# -------------------------
+def _configure_backend(backend):
+    name, _, compile_mode = backend.partition("+")
+    cfg.INFERENCE_BACKEND = name
+    cfg.INFERENCE_COMPILE = compile_mode or "none"
+
+
+def measure_models(backends, threads, batch_sizes, repeat):
+    """One row per (backend, threads, batch): PMT + health forward latency and images/s."""
+    import torch
+    from backend.model_registry import model_registry
+
+    rng = np.random.default_rng(cfg.SEED)
+    # whole batches per forward, no micro-batcher threads: the forward cost is what is measured
+    cfg.INFERENCE_BATCH_SIZE = max(batch_sizes)
+    cfg.MICROBATCH_WAIT_MS = 0
+
+    rows = []
+    for backend in backends:
+        print(f"\n⏱️ backend {backend}")
+        for n_threads in threads:
+            _configure_backend(backend)
+            cfg.TORCH_NUM_THREADS = n_threads
+            torch.set_num_threads(n_threads)
+            model_registry.clear()
+            if not model_registry.load():
+                raise SystemExit(f"❌ Health model not available in {cfg.CHECKPOINT_DIR} (run backend/startup.py first)")
+            if backend == "onnx" and model_registry._get_onnx("health", model_registry.health_ckpt) is None:
+                print("  ⚠️ Skipping onnx: no usable export")
+                break
+
+            pmt_forward, health_forward = model_registry.pmt_forward(), model_registry.health_forward()
+            for batch_size in batch_sizes:
+                x = torch.from_numpy(rng.normal(0, 1, (batch_size, 3, cfg.IMAGE_SIZE, cfg.IMAGE_SIZE)).astype(np.float32))
+
+                def forward():
+                    with torch.no_grad():
+                        pmt_forward(x)
+                        health_forward(x)
+
+                stats = timeit(forward, repeat, max_seconds=5.0)
+                stats["images_per_s"] = batch_size / (stats["median_ms"] / 1000)
+                rows.append({"backend": backend, "threads": n_threads, "batch": batch_size, **stats})
+                print(f"  threads {n_threads:<3} batch {batch_size:<3} median {stats['median_ms']:9.2f} ms   "
+                      f"{stats['images_per_s']:8.1f} img/s")
+    model_registry.clear()
+    return rows
+
+
+def choose_model_settings(rows):
+    """(backend, threads, batch) per the rules in the module docstring."""
+    peaks = {}
+    for row in rows:
+        key = (row["backend"], row["threads"])
+        peaks[key] = max(peaks.get(key, 0.0), row["images_per_s"])
+    best = max(peaks.values())
+    backend, threads = min(
+        (key for key, peak in peaks.items() if peak >= best * (1 - TIE_TOLERANCE)),
+        key=lambda key: (key[1], -peaks[key]),
+    )
+    peak = peaks[(backend, threads)]
+    batch = min(
+        row["batch"] for row in rows
+        if (row["backend"], row["threads"]) == (backend, threads) and row["images_per_s"] >= peak * (1 - TIE_TOLERANCE)
+    )
+    return backend, threads, batch
+
+
+# -------------------------
+# OpenCV sweep
+# -------------------------
+def measure_cv2(cv2_threads, images=32):
+    """images/s of decode + feature extraction on cfg.FEATURE_WORKERS threads, per cv2 thread count."""
+    import cv2
+    from backend.image_features import extract_image_features_from_bytes
+
+    rng = np.random.default_rng(cfg.SEED)
+    jpeg = cv2.imencode(".jpg", synthetic_image(rng), [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+    default_threads = cv2.getNumThreads()
+
+    print(f"\n⏱️ OpenCV ({cfg.FEATURE_WORKERS} feature workers)")
+    rows = []
+    with ThreadPoolExecutor(max_workers=cfg.FEATURE_WORKERS) as pool:
+        for n_threads in cv2_threads:
+            cv2.setNumThreads(n_threads)
+            list(pool.map(extract_image_features_from_bytes, [jpeg] * cfg.FEATURE_WORKERS))  # warm-up
+            start = time.perf_counter()
+            list(pool.map(extract_image_features_from_bytes, [jpeg] * images))
+            per_s = images / (time.perf_counter() - start)
+            rows.append({"cv2_threads": n_threads, "images_per_s": per_s})
+            print(f"  cv2 threads {n_threads:<3} {per_s:8.1f} img/s")
+    cv2.setNumThreads(default_threads)
+    return rows
+
+
+def choose_cv2_threads(rows):
+    best = max(row["images_per_s"] for row in rows)
+    return min(row["cv2_threads"] for row in rows if row["images_per_s"] >= best * (1 - TIE_TOLERANCE))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune CPU inference settings for this host and write a deployment profile", allow_abbrev=False)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(DEFAULT_BACKENDS))
+    parser.add_argument("--threads", nargs="+", type=int, default=None, help="torch threads to try (default: 1, 2, 4, ... CPU count)")
+    parser.add_argument("--cv2-threads", nargs="+", type=int, default=None, help="OpenCV threads to try (default: 0 + the torch candidates)")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=list(DEFAULT_BATCH_SIZES))
+    parser.add_argument("--quick", action="store_true", help="Fewer repetitions (smoke run)")
+    parser.add_argument("--output", type=str, default=None, help=f"Profile path (default {cfg.DEPLOYMENT_PROFILE})")
+    parser.add_argument("--dry-run", action="store_true", help="Print the chosen settings, write nothing")
+    args = parser.parse_args()
+
+    backends = args.backends
+    if cfg.INFERENCE_PROCESSES > 0 and backends != ["torch"]:
+        print(f"ℹ INFERENCE_PROCESSES={cfg.INFERENCE_PROCESSES}: sweeping the torch backend only (was {backends})")
+        backends = ["torch"]
+    threads = args.threads or thread_candidates()
+    cv2_threads = args.cv2_threads or [0] + thread_candidates()
+
+    model_rows = measure_models(backends, threads, sorted(args.batch_sizes), 3 if args.quick else 10)
+    cv2_rows = measure_cv2(cv2_threads, images=8 if args.quick else 32)
+
+    backend, n_threads, batch = choose_model_settings(model_rows)
+    name, _, compile_mode = backend.partition("+")
+    settings = {
+        "TORCH_NUM_THREADS": n_threads,
+        "CV2_NUM_THREADS": choose_cv2_threads(cv2_rows),
+        "INFERENCE_BACKEND": name,
+        "INFERENCE_COMPILE": compile_mode or "none",
+        "INFERENCE_BATCH_SIZE": batch,
+        "MICROBATCH_MAX_SIZE": batch,
+    }
+    print(f"\n✅ Chosen: {settings}")
+
+    profile = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "model": cfg.MODEL_NAME,
+        "inference_processes": cfg.INFERENCE_PROCESSES,
+        "host": host_info(),
+        "settings": settings,
+        "measurements": {"models": model_rows, "cv2": cv2_rows},
+    }
+    if args.dry_run:
+        return
+
+    out_path = args.output or cfg.DEPLOYMENT_PROFILE
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    tmp = f"{out_path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp, out_path)
+    print(f"Deployment profile saved to: {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# backend/batching.py
+"""
+Dynamic micro-batching for the inference models.
+Concurrent /predict requests each submit their [n,3,H,W] batch; a scheduler thread
+merges whatever arrives within max_wait_ms (up to max_batch_size rows) into one
+forward pass and hands each request back its own rows.
+"""
+
+import os
+import sys
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+import torch
+
+from core import config as cfg
+from backend import tracing
+
+
+def forward_in_chunks(forward, batch, chunk_size=None):
+    """
+    Run forward on a [N,3,H,W] batch, at most cfg.INFERENCE_BATCH_SIZE rows per call.
+    forward may return a tensor or a tuple of tensors (None entries are kept as None).
+    """
+    chunk_size = chunk_size or cfg.INFERENCE_BATCH_SIZE
+    if batch.size(0) <= chunk_size:
+        return forward(batch)
+
+    chunks = [forward(batch[i:i + chunk_size]) for i in range(0, batch.size(0), chunk_size)]
+    if isinstance(chunks[0], tuple):
+        return tuple(
+            None if parts[0] is None else torch.cat(parts, dim=0)
+            for parts in zip(*chunks)
+        )
+    return torch.cat(chunks, dim=0)
+
+
+def _slice_rows(output, start, end):
+    if isinstance(output, tuple):
+        return tuple(None if o is None else o[start:end] for o in output)
+    return output[start:end]
+
+
+class MicroBatcher:
+    """
+    Callable wrapper around forward(batch): batcher(x) blocks until the merged
+    forward pass that included x has run, then returns forward's rows for x.
+    """
+
+    _STOP = object()
+
+    def __init__(self, forward, max_batch_size=32, max_wait_ms=10, name="microbatch"):
+        self.forward = forward
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def __call__(self, batch):
+        if tracing.active():
+            # profiled request: run in the caller's (profiled) thread, unbatched
+            return self.forward(batch)
+        future = Future()
+        self._ensure_started()
+        self._queue.put((batch, future))
+        return future.result()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        carry = None  # request that did not fit into the previous merged batch
+        while True:
+            item = carry if carry is not None else self._queue.get()
+            carry = None
+            if item is self._STOP:
+                return
+
+            items = [item]
+            rows = item[0].size(0)
+            deadline = time.monotonic() + self.max_wait
+            while rows < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    nxt = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if nxt is self._STOP or rows + nxt[0].size(0) > self.max_batch_size:
+                    carry = nxt
+                    break
+                items.append(nxt)
+                rows += nxt[0].size(0)
+
+            self._run(items)
+
+    def _run(self, items):
+        try:
+            batch = items[0][0] if len(items) == 1 else torch.cat([b for b, _ in items], dim=0)
+            # grad mode is thread-local: the callers' no_grad() does not reach this thread
+            with torch.no_grad():
+                output = forward_in_chunks(self.forward, batch, self.max_batch_size)
+        except Exception as e:
+            for _, future in items:
+                future.set_exception(e)
+            return
+
+        start = 0
+        for b, future in items:
+            end = start + b.size(0)
+            future.set_result(_slice_rows(output, start, end))
+            start = end
+
+    @property
+    def pending(self) -> int:
+        """Requests waiting for the scheduler thread (backend.metrics queue depth)."""
+        return self._queue.qsize()
+
+    def stop(self):
+        """Finish queued work and stop the scheduler thread."""
+        with self._lock:
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(self._STOP)
+            thread.join()
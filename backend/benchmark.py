@@ -0,0 +1,287 @@
+# backend/benchmark.py
+"""
+Micro-benchmarks for the backend hot paths, on synthetic images and feature dicts
+(no dataset, checkpoints or network needed):
+
+    features     extract_image_features (256px array, full-size array, JPEG bytes), compute_image_hash
+    similarity   compare_transformer_features at growing stored-feature counts
+    adaptive     AdaptiveLayer.adjust at growing memory sizes
+    models       forward pass of every build_model architecture at batch 1 / 8 / 32
+
+    python backend/benchmark.py                                   # all suites
+    python backend/benchmark.py --suite features similarity --quick
+    python backend/benchmark.py --compare outputs/metrics/benchmarks/<earlier run>.json
+
+Results go to cfg.METRICS_DIR/benchmarks/benchmark-<timestamp>.json (or --output), with
+the commit, library versions and the perf-relevant config, so runs can be compared.
+Performance changes should quote the before/after numbers from this suite.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+import numpy as np
+
+from core import config as cfg
+
+SUITES = ("features", "similarity", "adaptive", "models")
+ARCHITECTURES = ["custom_cnn", "resnet18", "resnet50", "efficientnet_b0", "efficientnet_b3", "pmt_classifier"]
+BATCH_SIZES = (1, 8, 32)
+STORED_COUNTS = (1, 10, 100, 1000)
+MEMORY_SIZES = (10, 100, 1000, 10000)
+
+
+# -------------------------
+# Timing
+# -------------------------
+def timeit(fn, repeat=20, warmup=2, max_seconds=5.0):
+    """
+    Call fn() warmup times untimed, then up to repeat times (stopping early once
+    max_seconds are spent, after at least 3 runs). Returns latency stats in ms.
+    """
+    for _ in range(warmup):
+        fn()
+    times = []
+    start = time.perf_counter()
+    while len(times) < repeat:
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+        if len(times) >= 3 and time.perf_counter() - start > max_seconds:
+            break
+    times = np.asarray(times)
+    return {
+        "runs": len(times),
+        "mean_ms": float(times.mean()),
+        "median_ms": float(np.median(times)),
+        "p95_ms": float(np.percentile(times, 95)),
+        "min_ms": float(times.min()),
+    }
+
+
+def _result(suite, name, params, stats):
+    row = {"suite": suite, "name": name, "params": params, **stats}
+    label = ", ".join(f"{k}={v}" for k, v in params.items())
+    print(f"  {name:<36} {label:<36} median {stats['median_ms']:9.3f} ms   p95 {stats['p95_ms']:9.3f} ms")
+    return row
+
+
+# -------------------------
+# Synthetic inputs
+# -------------------------
+def synthetic_image(rng, height=1200, width=1600):
+    """BGR photo stand-in: smooth gradients + blocks + noise (compresses like a photo, not like pure noise)."""
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    image = np.stack([
+        128 + 100 * np.sin(x / (37 + 10 * c) + y / (53 + 7 * c) + c) for c in range(3)
+    ], axis=-1)
+    for _ in range(12):
+        y0, x0 = rng.integers(0, height - 100), rng.integers(0, width - 100)
+        image[y0:y0 + rng.integers(50, 300), x0:x0 + rng.integers(50, 300)] = rng.integers(0, 255, 3)
+    image += rng.normal(0, 8, image.shape)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def synthetic_features(rng, n):
+    """n feature dicts shaped like backend.image_features output (color 192, shape 9, 256-bit hash)."""
+    features = []
+    for _ in range(n):
+        color = rng.random(192)
+        features.append({
+            "color": (color / color.sum()).tolist(),
+            "shape": rng.normal(0, 1, 9).tolist(),
+            "imageHash": "".join(rng.choice(list("0123456789abcdef"), 64)),
+        })
+    return features
+
+
+# -------------------------
+# Suites
+# -------------------------
+def bench_features(rng, repeat):
+    import cv2
+    from backend.image_features import (
+        extract_image_features_from_array,
+        extract_image_features_from_bytes,
+        compute_image_hash,
+        resize_for_features,
+    )
+
+    print("\n⏱️ features")
+    full = synthetic_image(rng)
+    small = resize_for_features(full)
+    jpeg = cv2.imencode(".jpg", full, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+    return [
+        _result("features", "extract_image_features", {"input": "256x256 array"},
+                timeit(lambda: extract_image_features_from_array(small), repeat)),
+        _result("features", "extract_image_features", {"input": "1600x1200 array"},
+                timeit(lambda: extract_image_features_from_array(full), repeat)),
+        _result("features", "extract_image_features", {"input": "1600x1200 jpeg"},
+                timeit(lambda: extract_image_features_from_bytes(jpeg), repeat)),
+        _result("features", "extract_image_features", {"input": f"1600x1200 jpeg, min_size={max(cfg.IMAGE_SIZE, 256)}"},
+                timeit(lambda: extract_image_features_from_bytes(jpeg, max(cfg.IMAGE_SIZE, 256)), repeat)),
+        _result("features", "compute_image_hash", {"input": "256x256 array"},
+                timeit(lambda: compute_image_hash(small), repeat)),
+    ]
+
+
+def bench_similarity(rng, repeat):
+    from backend.similarity import compare_transformer_features
+
+    print("\n⏱️ similarity")
+    new = synthetic_features(rng, 3)  # a typical upload batch
+    results = []
+    for count in STORED_COUNTS:
+        stored = synthetic_features(rng, count)
+        results.append(_result("similarity", "compare_transformer_features", {"new": len(new), "stored": count},
+                               timeit(lambda: compare_transformer_features(new, stored), repeat)))
+    return results
+
+
+def bench_adaptive(rng, repeat):
+    from backend.adaptation import AdaptiveLayer
+
+    print("\n⏱️ adaptive")
+    query = synthetic_features(rng, 1)[0]
+    predicted = rng.random(13) * 6
+    results = []
+    for size in MEMORY_SIZES:
+        layer = AdaptiveLayer(max_memory=size)
+        layer.memory = [{"features": f, "diff": rng.normal(0, 0.5, 13)} for f in synthetic_features(rng, size)]
+        results.append(_result("adaptive", "AdaptiveLayer.adjust", {"memory": size},
+                               timeit(lambda: layer.adjust(predicted, query), repeat)))
+    return results
+
+
+def bench_models(rng, repeat, architectures=None):
+    import torch
+
+    from backend.train import build_model
+    from core.utils import get_device, autocast
+
+    print(f"\n⏱️ models (torch threads: {torch.get_num_threads()}, mixed precision: {cfg.MIXED_PRECISION})")
+    device = get_device()
+    results = []
+    for name in architectures or ARCHITECTURES:
+        try:
+            model = build_model(name, pretrained=False)  # random weights: only the forward cost matters
+        except Exception as e:
+            print(f"  ⚠️ Skipping {name}: {e}")
+            continue
+        model.to(device).eval()
+        for batch_size in BATCH_SIZES:
+            x = torch.from_numpy(rng.normal(0, 1, (batch_size, 3, cfg.IMAGE_SIZE, cfg.IMAGE_SIZE)).astype(np.float32)).to(device)
+
+            def forward():
+                with torch.no_grad(), autocast(device):
+                    model(x)
+                if device.type == "cuda":
+                    torch.cuda.synchronize()
+
+            stats = timeit(forward, repeat, max_seconds=10.0)
+            stats["ms_per_image"] = stats["median_ms"] / batch_size
+            results.append(_result("models", "forward", {"model": name, "batch": batch_size}, stats))
+    return results
+
+
+# -------------------------
+# Run metadata + comparison
+# -------------------------
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run_metadata():
+    meta = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "config": {
+            "IMAGE_SIZE": cfg.IMAGE_SIZE,
+            "MIXED_PRECISION": cfg.MIXED_PRECISION,
+            "TORCH_NUM_THREADS": cfg.TORCH_NUM_THREADS,
+            "CV2_NUM_THREADS": cfg.CV2_NUM_THREADS,
+        },
+    }
+    for module in ("torch", "cv2"):
+        if module in sys.modules:
+            meta[module] = sys.modules[module].__version__
+    return meta
+
+
+def _key(row):
+    return (row["suite"], row["name"], json.dumps(row["params"], sort_keys=True))
+
+
+def compare(previous_path, results):
+    """Print median latency changes against an earlier run's JSON."""
+    with open(previous_path, "r") as f:
+        previous = json.load(f)
+    before = {_key(r): r for r in previous["results"]}
+    print(f"\n📊 vs {previous_path} (commit {previous['meta'].get('commit')})")
+    for row in results:
+        old = before.get(_key(row))
+        if old is None:
+            continue
+        change = (row["median_ms"] - old["median_ms"]) / old["median_ms"] * 100 if old["median_ms"] else 0.0
+        label = ", ".join(f"{k}={v}" for k, v in row["params"].items())
+        print(f"  {row['name']:<36} {label:<36} {old['median_ms']:9.3f} → {row['median_ms']:9.3f} ms ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the backend hot paths on synthetic inputs", allow_abbrev=False)
+    parser.add_argument("--suite", nargs="+", choices=SUITES, default=list(SUITES), help="Suites to run (default: all)")
+    parser.add_argument("--models", nargs="+", choices=ARCHITECTURES, default=None, help="Architectures for the models suite")
+    parser.add_argument("--quick", action="store_true", help="Fewer repetitions (smoke run)")
+    parser.add_argument("--output", type=str, default=None, help="Results JSON path")
+    parser.add_argument("--compare", type=str, default=None, help="Earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    from backend.executors import configure_threads
+
+    configure_threads()
+    rng = np.random.default_rng(cfg.SEED)
+    repeat = 5 if args.quick else 30
+
+    results = []
+    if "features" in args.suite:
+        results += bench_features(rng, repeat)
+    if "similarity" in args.suite:
+        results += bench_similarity(rng, repeat)
+    if "adaptive" in args.suite:
+        results += bench_adaptive(rng, repeat)
+    if "models" in args.suite:
+        results += bench_models(rng, 3 if args.quick else 10, args.models)
+
+    out_path = args.output or os.path.join(
+        cfg.METRICS_DIR, "benchmarks", f"benchmark-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w") as f:
+        json.dump({"meta": run_metadata(), "results": results}, f, indent=2)
+    print(f"\nResults saved to: {out_path}")
+
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
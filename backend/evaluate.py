@@ -8,6 +8,7 @@ import torch
 import torch.nn as nn
 from torch.utils.data import DataLoader
 from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, confusion_matrix
 import pandas as pd
 from tqdm import tqdm
 import numpy as np
@@ -15,13 +16,18 @@ import numpy as np
 from core import config as cfg
 from core.dataset import TransformerHealthDataset
 from core.augment import build_transforms
-from core.utils import get_device
+from core.utils import get_device, autocast, resolve_weights_path, load_state_for_inference, instantiate_with_state
 from models.custom_cnn import CustomCNN
 from models.resnet import build_resnet
 from models.efficientnet import build_efficientnet
-from PIL import Image
-from backend.gradCam import generate_gradcam_for_image
-from backend.image_features import extract_image_features
+from backend.gradCam import closed_form_cam, get_gradcam_engine, encode_cam_overlay, new_overlay_name
+from backend.storage import get_storage
+from backend.image_context import as_image_contexts
+from backend.model_registry import model_registry
+from backend.gradcam_jobs import gradcam_jobs
+from backend.prediction_cache import prediction_cache
+from backend.metrics import stage_seconds, images_total
+from backend.tracing import traced
 
 # 13 parameter column names (same as dataset)
 PARAM_COLUMNS = [
@@ -45,28 +51,61 @@ PARAM_COLUMNS = [
 # -------------------------
 def load_model(ckpt_path: str):
     name = cfg.MODEL_NAME
-    pretrained = cfg.PRETRAINED
     dropout = cfg.DROPOUT
 
+    weights_path = resolve_weights_path(ckpt_path)  # slim .safetensors export if present
+    if not os.path.exists(weights_path):
+        raise FileNotFoundError(f"Checkpoint not found: {ckpt_path}")
+
+    # The checkpoint overwrites every weight, so never pay for the ImageNet init here
     if name == "custom_cnn":
-        model = CustomCNN(dropout=dropout)
+        build = lambda: CustomCNN(dropout=dropout)
     elif "resnet" in name:
-        # resnet builder accepts pretrained, dropout in your codebase
-        model = build_resnet(model_name=name, pretrained=pretrained, dropout=dropout)
+        build = lambda: build_resnet(model_name=name, pretrained=False, dropout=dropout)
     elif "efficientnet" in name:
-        # your efficientnet builder uses config globals, so only pass name
-        model = build_efficientnet(model_name=name)
+        build = lambda: build_efficientnet(model_name=name, pretrained=False)
     else:
         raise ValueError(f"❌ Unknown MODEL_NAME: {name}")
 
-    if not os.path.exists(ckpt_path):
-        raise FileNotFoundError(f"Checkpoint not found: {ckpt_path}")
-
-    state = torch.load(ckpt_path, map_location="cpu")
-    model.load_state_dict(state["model_state"])
-    print(f"✅ Loaded model from: {ckpt_path}")
+    # built on the meta device, parameters taken straight from the (memory-mapped) weights
+    model = instantiate_with_state(build, load_state_for_inference(ckpt_path))
+    print(f"✅ Loaded model from: {weights_path}")
     return model
 
+# -------------------------
+# Metrics (shared with backend/quantization.py's accuracy report)
+# -------------------------
+def regression_metrics(trues, preds):
+    """MAE and R² in the native 0-6 scale for [N,13] targets / predictions."""
+    overall_mae = mean_absolute_error(trues, preds)         # average across all params
+    per_param_mae = mean_absolute_error(trues, preds, multioutput='raw_values')  # array length 13
+    # Optionally compute R2 per-parameter and mean R2
+    r2_per_param = []
+    for i in range(len(PARAM_COLUMNS)):
+        try:
+            r2_per_param.append(r2_score(trues[:, i], preds[:, i]))
+        except Exception:
+            r2_per_param.append(float('nan'))
+    mean_r2 = np.nanmean(r2_per_param)
+
+    return {
+        "overall_mae_0_6": overall_mae,
+        "per_param_mae_0_6": per_param_mae,
+        "r2_per_param": r2_per_param,
+        "mean_r2": mean_r2,
+    }
+
+
+def classification_metrics(labels, preds):
+    """Binary PMT metrics (1 = PMT is the positive class)."""
+    return {
+        "accuracy": accuracy_score(labels, preds),
+        "precision": precision_score(labels, preds, zero_division=0),
+        "recall": recall_score(labels, preds, zero_division=0),
+        "f1": f1_score(labels, preds, zero_division=0),
+        "confusion_matrix": confusion_matrix(labels, preds),
+    }
+
 # -------------------------
 # Evaluate on test set
 # -------------------------
@@ -101,7 +140,9 @@ def evaluate_test(ckpt_path: str = cfg.CHECKPOINT_PATH):
             imgs = imgs.to(device)                  # [B,3,H,W]
             targets = targets.to(device)            # [B,13]
 
-            outputs = model(imgs)                   # [B,13]
+            with autocast(device):                  # bf16 if cfg.MIXED_PRECISION
+                outputs = model(imgs)               # [B,13]
+            outputs = outputs.float()               # loss / metrics in float32
             loss = criterion(outputs, targets)      # elementwise L1 averaged over all elements
             losses.append(float(loss.item() * imgs.size(0)))
 
@@ -114,16 +155,11 @@ def evaluate_test(ckpt_path: str = cfg.CHECKPOINT_PATH):
     avg_loss = sum(losses) / len(test_loader.dataset)
 
     # Metrics in native 0-6 scale
-    overall_mae = mean_absolute_error(trues, preds)         # average across all params
-    per_param_mae = mean_absolute_error(trues, preds, multioutput='raw_values')  # array length 13
-    # Optionally compute R2 per-parameter and mean R2
-    r2_per_param = []
-    for i in range(len(PARAM_COLUMNS)):
-        try:
-            r2_per_param.append(r2_score(trues[:, i], preds[:, i]))
-        except Exception:
-            r2_per_param.append(float('nan'))
-    mean_r2 = np.nanmean(r2_per_param)
+    metrics = regression_metrics(trues, preds)
+    overall_mae = metrics["overall_mae_0_6"]
+    per_param_mae = metrics["per_param_mae_0_6"]
+    r2_per_param = metrics["r2_per_param"]
+    mean_r2 = metrics["mean_r2"]
 
     # Save predictions: one row per sample, columns = PARAM_COLUMNS + overall_sum
     pred_df = pd.DataFrame(preds, columns=PARAM_COLUMNS)
@@ -166,19 +202,14 @@ def load_pmt_model():
     device = get_device()
     ckpt_path = os.path.join(cfg.CHECKPOINT_DIR, "pmt_classifier_best.pth")
     
-    if not os.path.exists(ckpt_path):
+    if not os.path.exists(resolve_weights_path(ckpt_path)):
          # If exact name not found, try user provided path logic or warn
          # Assuming user followed instructions and placed it there
          raise FileNotFoundError(f"PMT Checkpoint not found: {ckpt_path}")
 
-    model = build_pmt_classifier().to(device)
-    state = torch.load(ckpt_path, map_location=device)
-    
-    # helper to load state dict safely
-    if "model_state" in state:
-        model.load_state_dict(state["model_state"])
-    else:
-        model.load_state_dict(state)
+    # accepts {"model_state": ...} checkpoints, bare state dicts and slim exports
+    model = instantiate_with_state(lambda: build_pmt_classifier(pretrained=False), load_state_for_inference(ckpt_path))
+    model.to(device)
         
     model.eval()
     return model
@@ -186,123 +217,241 @@ def load_pmt_model():
 # -------------------------
 # Single / small-batch inference + GradCAM (FIXED VERSION)
 # -------------------------
-def evaluate_transformer(image_paths):
-    device = get_device()
-    
-    # 1. Load Health Model
-    health_ckpt = os.path.join(cfg.CHECKPOINT_DIR, f"{cfg.MODEL_NAME}_best.pth")
-    try:
-        health_model = load_model(health_ckpt).to(device)
-    except FileNotFoundError as e:
-        print(f"FATAL ERROR: Health Model Checkpoint not found at {health_ckpt}. Cannot run analysis.")
+@traced("gradcam")
+def _render_gradcam_png(img, feats, param_index, x):
+    """Build the CAM for one image and return its overlay as PNG bytes."""
+    with stage_seconds.time(stage="gradcam"):
+        if feats is not None:
+            # Linear head: CAM straight from the inference feature map, no backward pass
+            cam = closed_form_cam(model_registry.health_head(), feats, param_index)
+        else:
+            # Non-linear head (e.g. Sigmoid): fall back to gradient-based Grad-CAM
+            # (persistent engine, eval mode, backward only down to the target layer).
+            # Under ONNX serving this builds the PyTorch model on first use.
+            health_model = model_registry.get_health_model()
+            if health_model is None:
+                raise RuntimeError("Grad-CAM needs the PyTorch health model, which is not available")
+            cam = get_gradcam_engine(health_model).generate(x, param_index)
+    with stage_seconds.time(stage="overlay_encode"):
+        return encode_cam_overlay(img, cam)
+
+
+def _render_gradcam(img, feats, param_index, x, cache_key=None):
+    """Render one overlay and upload it; returns the public URL (background job body)."""
+    png = _render_gradcam_png(img, feats, param_index, x)
+    with stage_seconds.time(stage="storage_upload"):
+        url = get_storage().upload(new_overlay_name(), png, "image/png")
+    if cache_key is not None:
+        prediction_cache.update(cache_key, gradcam_url=url)
+    return url
+
+
+@traced()
+def evaluate_transformer(images, gradcam_async=None):
+    """
+    images: image paths and/or ImageContext objects (each decoded once and shared
+    with the caller, e.g. /predict's adaptive layer reuses "providedImages").
+
+    gradcam_async=True returns Grad-CAM job ids in "gradCamJobs" instead of waiting
+    for the overlays ("gradCamImages" is then empty). Defaults to cfg.GRADCAM_ASYNC.
+
+    Images already seen with the same checkpoints (backend.prediction_cache) skip the
+    models, and an overlay rendered for them before is returned in "gradCamImages"
+    even in async mode. Identical uploads within one request are evaluated once.
+    """
+    if gradcam_async is None:
+        gradcam_async = cfg.GRADCAM_ASYNC
+
+    device = model_registry.device
+
+    # 1. Health Model (built once per process by the registry)
+    if not model_registry.health_available():
+        print(f"FATAL ERROR: Health Model Checkpoint not found at {model_registry.health_ckpt}. Cannot run analysis.")
         return {
             "predictions": [],
             "healthIndex": 0.0,
             "paramsScores": {},
             "gradCamImages": [],
+            "gradCamJobs": [],
         }
 
-    health_model.eval()
-
-    # 2. Load PMT Classifier
-    pmt_model = None
-    try:
-        pmt_model = load_pmt_model()
-        print("✅ PMT Classifier loaded for image filtering.")
-    except Exception as e:
-        print(f"⚠️ Warning: Could not load PMT model: {e}. All images will be processed.")
-
-    # Transforms
-    _, _, test_t = build_transforms(
-        image_size=cfg.IMAGE_SIZE,
-        mean=cfg.NORMALIZE_MEAN,
-        std=cfg.NORMALIZE_STD,
-        augment_cfg={}
-    )
+    # 2. PMT Classifier (unavailable → all images will be processed)
+    pmt_available = model_registry.pmt_available()
 
     # Ensure GradCAM directory exists
     # os.makedirs(cfg.GRADCAM_DIR, exist_ok=True)
 
-    all_preds = []
+    contexts = as_image_contexts(images)
+    all_preds = [None] * len(contexts)  # filled in upload order
     gradcam_urls = [] 
+    gradcam_job_ids = []
+    pending_uploads = []  # (name, png bytes, primary idx, param index), uploaded together
     valid_scores_list = []
     pmt_image_features = []  # Only store features for PMT images
 
-    # We need torch.set_grad_enabled(True) for GradCAM
-    with torch.no_grad():
-        for idx, img_path in enumerate(image_paths):
-            try:
-                img = Image.open(img_path).convert("RGB")
-                img_t = test_t(img).unsqueeze(0).to(device)  # [1,3,H,W]
-            except Exception as e:
-                print(f"❌ Failed to load or transform image {img_path}: {e}")
-                all_preds.append({"status": "error", "image": os.path.basename(img_path)})
+    # --- Step 0: Hash every upload; decode each distinct image not in the cache ---
+    model_digest = model_registry.checkpoint_digest if prediction_cache.enabled else None
+    first_seen = {}   # content hash -> idx of its first upload
+    primary_of = {}   # idx -> idx whose result it shares (itself for first uploads)
+    cache_keys = {}   # primary idx -> prediction cache key
+    results = {}      # primary idx -> {"status", "outputs", "gradcam_url"}
+    decoded = []      # (idx, ImageContext) that need a forward pass
+    for idx, ctx in enumerate(contexts):
+        try:
+            digest = ctx.content_hash
+            if digest in first_seen:
+                primary_of[idx] = first_seen[digest]  # same bytes earlier in this request
+                continue
+            first_seen[digest] = idx
+            primary_of[idx] = idx
+
+            if model_digest is not None:
+                cache_keys[idx] = prediction_cache.prediction_key(digest, model_digest)
+                entry = prediction_cache.get(cache_keys[idx])
+                if entry is not None:
+                    results[idx] = entry
+                    print(f"♻️ Cached prediction reused for {ctx.name}.")
+                    continue
+
+            ctx.tensor  # decode + [3,H,W] model tensor
+            decoded.append((idx, ctx))
+        except Exception as e:
+            print(f"❌ Failed to load or transform image {ctx.source}: {e}")
+            all_preds[idx] = {"status": "error", "image": ctx.name}
+
+    health_outputs = {}  # idx -> [13] raw model output
+    health_feats = {}    # idx -> [1,C,h,w] final feature map (linear heads only, for CAM)
+    if decoded:
+        batch = torch.stack([ctx.tensor for _, ctx in decoded]).to(device)  # [N,3,H,W]
+
+        with torch.no_grad():
+            # --- Step 1: PMT Check (one forward pass for all images) ---
+            if pmt_available:
+                with stage_seconds.time(stage="pmt_forward"):
+                    pmt_out = model_registry.pmt_forward()(batch)
+                is_pmt = (torch.argmax(pmt_out, dim=1) != 0).cpu()  # 0=Non-PMT
+            else:
+                is_pmt = torch.ones(len(decoded), dtype=torch.bool)
+
+            # --- Step 2: Health Analysis (one forward pass on the PMT sub-batch) ---
+            pmt_rows = torch.nonzero(is_pmt, as_tuple=False).flatten()
+            if len(pmt_rows) > 0:
+                with stage_seconds.time(stage="health_forward"):
+                    outs, feats = model_registry.health_forward()(batch[pmt_rows.to(device)])
+                outs = outs.cpu().numpy()  # [P,13]
+                for i, row in enumerate(pmt_rows.tolist()):
+                    idx = decoded[row][0]
+                    health_outputs[idx] = outs[i]
+                    if feats is not None:
+                        health_feats[idx] = feats[i:i + 1]
+
+    for idx, _ in decoded:
+        if idx in health_outputs:
+            results[idx] = {"status": "processed", "outputs": health_outputs[idx].tolist(), "gradcam_url": None}
+        else:
+            results[idx] = {"status": "non-pmt", "outputs": None, "gradcam_url": None}
+        if idx in cache_keys:
+            prediction_cache.put(cache_keys[idx], results[idx])
+
+    # --- Step 3: Grad-CAM Generation (once per distinct PMT image) ---
+    gradcam_url_of = {}   # primary idx -> overlay URL
+    gradcam_job_of = {}   # primary idx -> background job id
+    for idx, entry in results.items():
+        if entry["status"] != "processed":
+            continue
+        if entry.get("gradcam_url"):
+            gradcam_url_of[idx] = entry["gradcam_url"]
+            continue
+
+        ctx = contexts[idx]
+        out = np.asarray(entry["outputs"], dtype=np.float32)
+
+        # Find the index of the parameter with the highest defect score
+        max_idx = int(np.argmax(out))
+
+        feats = health_feats.get(idx)
+        try:
+            x = ctx.tensor.unsqueeze(0).to(device)
+            if feats is None and idx not in health_outputs:
+                # cached result: one forward for the feature map is much cheaper than
+                # gradient Grad-CAM, and under ONNX needs no PyTorch model
+                # (still None for non-linear heads → gradient Grad-CAM)
+                with torch.no_grad():
+                    _, feats = model_registry.health_forward()(x)
+
+            if gradcam_async:
+                # overlay is rendered/uploaded in the background, polled via /gradcam/{job_id}
+                gradcam_job_of[idx] = gradcam_jobs.submit(
+                    _render_gradcam, ctx.image, feats, max_idx, x, cache_keys.get(idx)
+                )
                 continue
 
-            # --- Step 1: PMT Check ---
-            is_pmt = True
-            if pmt_model:
-                pmt_out = pmt_model(img_t)
-                pmt_pred = torch.argmax(pmt_out, dim=1).item()
-                if pmt_pred == 0:  # 0=Non-PMT
-                    is_pmt = False
-            
-            if not is_pmt:
-                print(f"⏩ Image {os.path.basename(img_path)} classified as Non-PMT. Skipping.")
-                all_preds.append({"status": "non-pmt", "image": os.path.basename(img_path)})
+            png = _render_gradcam_png(ctx.image, feats, max_idx, x)
+            pending_uploads.append((new_overlay_name(), png, idx, max_idx))
+        except Exception as e:
+            print(f"⚠️ GradCAM failed for {ctx.source}: {e}")
+            import traceback
+            traceback.print_exc()
+
+    # --- Step 4: Upload this request's overlays concurrently ---
+    if pending_uploads:
+        with stage_seconds.time(stage="storage_upload"):
+            uploaded = get_storage().upload_many([(name, png) for name, png, _, _ in pending_uploads])
+        for (_, _, idx, max_idx), result in zip(pending_uploads, uploaded):
+            ctx = contexts[idx]
+            if isinstance(result, Exception):
+                print(f"⚠️ GradCAM upload failed for {ctx.source}: {result}")
                 continue
+            gradcam_url_of[idx] = result  # full https:// URL
+            if idx in cache_keys:
+                prediction_cache.update(cache_keys[idx], gradcam_url=result)
+            print(f"✅ GradCAM uploaded for {ctx.name} at index {max_idx}.")
+
+    # --- Step 5: Per-upload results (duplicates share their first upload's result) ---
+    for idx, ctx in enumerate(contexts):
+        if all_preds[idx] is not None:
+            continue  # failed to load
+        base_name = ctx.name
+        primary = primary_of[idx]
+        entry = results.get(primary)
+
+        if entry is None:
+            # identical bytes to an upload that failed to decode
+            all_preds[idx] = {"status": "error", "image": base_name}
+            continue
+
+        if entry["status"] != "processed":
+            print(f"⏩ Image {base_name} classified as Non-PMT. Skipping.")
+            all_preds[idx] = {"status": "non-pmt", "image": base_name}
+            continue
+
+        images_total.inc(result="processed")
+        out = np.asarray(entry["outputs"], dtype=np.float32)  # [13]
+        out_clamped = np.clip(out, 0.0, 6.0)
+        overall_sum = float(out_clamped.sum())
+
+        preds_dict = {PARAM_COLUMNS[i]: float(out_clamped[i]) for i in range(len(PARAM_COLUMNS))}
+        preds_dict["overall_sum"] = overall_sum
+        preds_dict["status"] = "processed"
+        
+        all_preds[idx] = preds_dict
+        valid_scores_list.append(preds_dict)
+        
+        # --- Extract features for PMT images only ---
+        try:
+            pmt_image_features.append(contexts[primary].features)
+            print(f"✅ Features extracted for PMT image: {base_name}")
+        except Exception as e:
+            print(f"⚠️ Feature extraction failed for {ctx.source}: {e}")
 
-            # --- Step 2: Health Analysis ---
-            out = health_model(img_t)                      # [1,13]
-            out = out.squeeze(0).cpu().numpy()             # [13]
-            out_clamped = np.clip(out, 0.0, 6.0)
-            overall_sum = float(out_clamped.sum())
+        if primary in gradcam_url_of:
+            gradcam_urls.append(gradcam_url_of[primary])
+        elif primary in gradcam_job_of:
+            gradcam_job_ids.append(gradcam_job_of[primary])
 
-            preds_dict = {PARAM_COLUMNS[i]: float(out_clamped[i]) for i in range(len(PARAM_COLUMNS))}
-            preds_dict["overall_sum"] = overall_sum
-            preds_dict["status"] = "processed"
-            
-            all_preds.append(preds_dict)
-            valid_scores_list.append(preds_dict)
-            
-            # --- Extract features for PMT images only ---
-            try:
-                features = extract_image_features(img_path)
-                pmt_image_features.append(features)
-                print(f"✅ Features extracted for PMT image: {os.path.basename(img_path)}")
-            except Exception as e:
-                print(f"⚠️ Feature extraction failed for {img_path}: {e}")
-
-            # --- Step 3: Grad-CAM Generation ---
-            
-            # Find the index of the parameter with the highest defect score
-            max_idx = int(np.argmax(out))
-            
-            base_name = os.path.basename(img_path)
-            
-            try:
-                with torch.enable_grad():
-                    health_model.train()
-                    img_grad_t = test_t(img).unsqueeze(0).to(device).requires_grad_(True)
-                    
-                    # now returns a Supabase public URL instead of local path
-                    gradcam_url = generate_gradcam_for_image(
-                        health_model,
-                        img_path,
-                        None,  # save_path no longer used
-                        param_index=max_idx,
-                        input_tensor=img_grad_t
-                    )
-                    health_model.eval()
-                
-                gradcam_urls.append(gradcam_url)  # full https:// URL
-                print(f"✅ GradCAM uploaded to Supabase for {base_name} at index {max_idx}.")
-            except Exception as e:
-                print(f"⚠️ GradCAM failed for {img_path}: {e}")
-                import traceback
-                traceback.print_exc()
-                health_model.eval() # Ensure model is in eval mode even after failure
-                pass
+    for pred in all_preds:
+        if pred is not None and pred["status"] != "processed":
+            images_total.inc(result=pred["status"].replace("-", "_"))
 
     # Aggregate results for frontend
     if valid_scores_list:
@@ -319,13 +468,14 @@ def evaluate_transformer(image_paths):
         avg_health_index = 0.0
         aggregated_params = {} 
             
-    print(f"DEBUG: Returning {len(gradcam_urls)} GradCAM images. Health Index: {avg_health_index}")
+    print(f"DEBUG: Returning {len(gradcam_urls)} GradCAM images, {len(gradcam_job_ids)} GradCAM jobs. Health Index: {avg_health_index}")
     
     return {
         "predictions": all_preds,
         "healthIndex": avg_health_index,
         "paramsScores": aggregated_params,
         "gradCamImages": gradcam_urls,
+        "gradCamJobs": gradcam_job_ids,
         "providedImages": pmt_image_features,  # Only PMT image features
     }
 
@@ -334,7 +484,6 @@ def evaluate_transformer(image_paths):
 # -------------------------
 from core.dataset import PMTClassifierDataset
 from torchvision import transforms
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, confusion_matrix
 from models.pmt_classifier import build_pmt_classifier
 
 def evaluate_classifier_test(root_dir=None, batch_size=None):
@@ -358,8 +507,8 @@ def evaluate_classifier_test(root_dir=None, batch_size=None):
     test_ds = PMTClassifierDataset(test_dir, transform=test_t)
     test_loader = DataLoader(test_ds, batch_size=batch_size, shuffle=False, num_workers=0)
 
-    # Load best model
-    model = build_pmt_classifier().to(device)
+    # Load best model (weights come from the checkpoint, skip ImageNet init)
+    model = build_pmt_classifier(pretrained=False).to(device)
     ckpt_path = os.path.join(cfg.CHECKPOINT_DIR, "pmt_classifier_best.pth")
     if not os.path.exists(ckpt_path):
         raise FileNotFoundError(f"❌ Classifier checkpoint not found: {ckpt_path}")
@@ -373,17 +522,19 @@ def evaluate_classifier_test(root_dir=None, batch_size=None):
     with torch.no_grad():
         for imgs, labels in test_loader:
             imgs, labels = imgs.to(device), labels.to(device)
-            outputs = model(imgs)
-            preds = torch.argmax(outputs, dim=1)
+            with autocast(device):
+                outputs = model(imgs)
+            preds = torch.argmax(outputs.float(), dim=1)
             all_labels.extend(labels.cpu().numpy())
             all_preds.extend(preds.cpu().numpy())
 
     # Metrics
-    acc = accuracy_score(all_labels, all_preds)
-    prec = precision_score(all_labels, all_preds, zero_division=0)
-    rec = recall_score(all_labels, all_preds, zero_division=0)
-    f1 = f1_score(all_labels, all_preds, zero_division=0)
-    cm = confusion_matrix(all_labels, all_preds)
+    metrics = classification_metrics(all_labels, all_preds)
+    acc = metrics["accuracy"]
+    prec = metrics["precision"]
+    rec = metrics["recall"]
+    f1 = metrics["f1"]
+    cm = metrics["confusion_matrix"]
 
     print("\n🧪 Test Set Evaluation Complete")
     print(f"Accuracy:  {acc:.4f}")
@@ -422,6 +573,7 @@ if __name__ == "__main__":
         help="Specify which model to evaluate: 'regression' or 'classifier'"
     )
     args = parser.parse_args()
+    cfg.ensure_dirs()
 
     if args.model == "regression":
         ckpt_path = os.path.join(cfg.CHECKPOINT_DIR, f"{cfg.MODEL_NAME}_best.pth")
@@ -0,0 +1,91 @@
+# backend/executors.py
+"""
+Bounded thread pools for the blocking parts of the API.
+The endpoints are async; PyTorch inference and OpenCV feature work run here so one
+slow analysis never blocks the event loop (and with it every other request).
+
+    inference pool → evaluate_transformer (models, Grad-CAM)   cfg.INFERENCE_WORKERS
+    feature pool   → OpenCV decode / features / hashes          cfg.FEATURE_WORKERS
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from core import config as cfg
+
+_lock = threading.Lock()
+_pools = {}
+
+
+def _get_pool(name: str, max_workers: int) -> ThreadPoolExecutor:
+    with _lock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+            _pools[name] = pool
+        return pool
+
+
+def inference_pool() -> ThreadPoolExecutor:
+    return _get_pool("inference", cfg.INFERENCE_WORKERS)
+
+
+def feature_pool() -> ThreadPoolExecutor:
+    return _get_pool("features", cfg.FEATURE_WORKERS)
+
+
+async def run_inference(fn, *args, **kwargs):
+    """Await fn(*args, **kwargs) on the inference pool (queued while all workers are busy)."""
+    loop = asyncio.get_running_loop()
+    # the request's context (e.g. a backend.tracing profile) follows it into the pool
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(inference_pool(), functools.partial(ctx.run, fn, *args, **kwargs))
+
+
+async def run_features(fn, *args, **kwargs):
+    """Await fn(*args, **kwargs) on the OpenCV feature pool."""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(feature_pool(), functools.partial(ctx.run, fn, *args, **kwargs))
+
+
+def queue_depths() -> dict:
+    """{pool name: tasks waiting for a free worker} (backend.metrics queue depth)."""
+    with _lock:
+        pools = dict(_pools)
+    return {name: pool._work_queue.qsize() for name, pool in pools.items()}
+
+
+def configure_threads(torch_threads: bool = True):
+    """
+    Apply cfg.TORCH_NUM_THREADS / cfg.CV2_NUM_THREADS (None keeps the library default).
+    torch_threads=False leaves torch alone (and unimported) in feature-only workers.
+    """
+    if torch_threads and cfg.TORCH_NUM_THREADS:
+        import torch
+
+        torch.set_num_threads(cfg.TORCH_NUM_THREADS)
+        print(f"🧵 torch intra-op threads: {cfg.TORCH_NUM_THREADS}")
+
+    if cfg.CV2_NUM_THREADS is not None:
+        import cv2
+
+        cv2.setNumThreads(cfg.CV2_NUM_THREADS)
+        print(f"🧵 OpenCV threads: {cfg.CV2_NUM_THREADS}")
+
+
+def shutdown(wait: bool = False):
+    with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=wait)
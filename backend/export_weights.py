@@ -0,0 +1,70 @@
+# backend/export_weights.py
+"""
+Export slim inference weights: model_state only (no optimizer/Adam moments), in the
+safetensors layout, written next to each checkpoint as <checkpoint>.safetensors.
+
+    python backend/export_weights.py            # float32: memory-mapped, shared between processes
+    python backend/export_weights.py --half     # float16 storage: ~half the download size
+
+load_model / load_pmt_model (and so the API) prefer the .safetensors file whenever it
+is at least as new as its .pth. Upload the exports to the Supabase "models" bucket
+to make cold starts download them instead of the full checkpoints.
+"""
+
+import os
+import sys
+import argparse
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+import torch
+
+from core import config as cfg
+from core.utils import save_inference_weights, inference_weights_path, load_inference_weights
+
+
+def export_weights(ckpt_path: str, half: bool = False) -> str:
+    if not os.path.exists(ckpt_path):
+        raise FileNotFoundError(f"❌ Checkpoint not found: {ckpt_path}")
+
+    ckpt = torch.load(ckpt_path, map_location="cpu", weights_only=False)
+    state = ckpt.get("model_state", ckpt)
+    metadata = {"source": os.path.basename(ckpt_path), "precision": "fp16" if half else "fp32"}
+    for key in ("epoch", "best_metric"):
+        if key in ckpt:
+            metadata[key] = ckpt[key]
+
+    out_path = inference_weights_path(ckpt_path)
+    save_inference_weights(state, out_path, half=half, metadata=metadata)
+
+    # round-trip check: same names, shapes and (up to fp16 rounding) values
+    loaded = load_inference_weights(out_path)
+    atol = 1e-3 if half else 0.0
+    for name, t in state.items():
+        if not torch.allclose(loaded[name].to(t.dtype), t, atol=atol, rtol=1e-3 if half else 0.0):
+            raise ValueError(f"❌ Exported tensor differs from the checkpoint: {name}")
+
+    print(f"   {os.path.getsize(ckpt_path) / 2**20:.1f} MB checkpoint → {os.path.getsize(out_path) / 2**20:.1f} MB")
+    return out_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export inference-only weights (.safetensors) from training checkpoints")
+    parser.add_argument(
+        "--model", type=str, default="all",
+        choices=["regression", "classifier", "all"],
+        help="Which checkpoint to export"
+    )
+    parser.add_argument("--half", action="store_true", help="Store floating-point weights as float16")
+    args = parser.parse_args()
+
+    if args.model in ("regression", "all"):
+        export_weights(cfg.CHECKPOINT_PATH, half=args.half)
+    if args.model in ("classifier", "all"):
+        export_weights(os.path.join(cfg.CHECKPOINT_DIR, "pmt_classifier_best.pth"), half=args.half)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,8 +15,11 @@ from core import config as cfg
 from core.utils import get_device
 from models.efficientnet import build_efficientnet
 
+import threading
 import uuid
-from supabase import create_client
+import weakref
+
+from backend.storage import get_storage
 
 
 
@@ -26,33 +29,70 @@ from supabase import create_client
 # ============================================================
 
 class GradCAM:
-    """Grad-CAM for EfficientNet13 (multi-output regression)"""
+    """
+    Grad-CAM for EfficientNet13 (multi-output regression).
+
+    Reusable engine: the forward hook is registered once and shared by every call.
+    The model stays in eval mode with parameter requires_grad disabled, and the
+    target layer's output is cut from the graph, so the backward pass only runs
+    from the output down to the target layer (no weight gradients, no BN updates).
+    """
     def __init__(self, model, target_layer):
         self.model = model
         self.model.eval()
+        self.model.requires_grad_(False)
         self.target_layer = target_layer
-        self.gradients = None
-        self.activations = None
-
-        # Hooks
-        target_layer.register_forward_hook(self._save_activation)
-        target_layer.register_full_backward_hook(self._save_gradient)
-
-    def _save_activation(self, module, inp, out):
-        self.activations = out.detach()
 
-    def _save_gradient(self, module, grad_in, grad_out):
-        self.gradients = grad_out[0].detach()
-
-    def generate(self):
-        weights = self.gradients.mean(dim=(2, 3), keepdim=True)
-        cam = (weights * self.activations).sum(dim=1, keepdim=True)
+        # per-thread capture state, so concurrent requests don't share activations
+        self._state = threading.local()
+        self._handle = target_layer.register_forward_hook(self._capture_activation)
+
+    def _capture_activation(self, module, inp, out):
+        if not getattr(self._state, "active", False):
+            return None  # plain inference forward, leave untouched
+        activations = out.detach().requires_grad_(True)
+        self._state.activations = activations
+        return activations
+
+    def generate(self, x, param_index=0):
+        """Return a [1,1,h,w] CAM in [0,1] for output param_index of a [1,3,H,W] input."""
+        self._state.active = True
+        try:
+            with torch.enable_grad():
+                output = self.model(x.detach())  # shape = (1,13)
+                activations = self._state.activations
+                score = output[0, param_index]
+                gradients, = torch.autograd.grad(score, activations)
+        finally:
+            self._state.active = False
+            self._state.activations = None
+
+        weights = gradients.mean(dim=(2, 3), keepdim=True)
+        cam = (weights * activations.detach()).sum(dim=1, keepdim=True)
         cam = torch.relu(cam)
 
         cam -= cam.min()
         cam /= (cam.max() + 1e-8)
         return cam
 
+    def remove(self):
+        """Detach the hook from the target layer."""
+        self._handle.remove()
+
+
+_engines = weakref.WeakKeyDictionary()
+_engines_lock = threading.Lock()
+
+
+def get_gradcam_engine(model):
+    """Return the GradCAM engine for model, creating (and hooking) it only once."""
+    with _engines_lock:
+        engine = _engines.get(model)
+        if engine is None:
+            engine = GradCAM(model, get_target_layer(model))
+            _engines[model] = engine
+        return engine
+
 
 # ============================================================
 # Helpers
@@ -68,6 +108,78 @@ def get_target_layer(model):
     raise ValueError("Cannot find conv layer for Grad-CAM in this model.")
 
 
+def get_linear_head(model):
+    """
+    Return the nn.Linear of a head that is Linear (optionally after Dropout) on
+    globally pooled features, e.g. EfficientNet13.fc. Returns None for any other
+    head (e.g. the ResNet variant's Sigmoid head), where only Grad-CAM applies.
+    """
+    head = getattr(model, "fc", None)
+    if isinstance(head, torch.nn.Linear):
+        return head
+    if isinstance(head, torch.nn.Sequential):
+        layers = [m for m in head if not isinstance(m, torch.nn.Dropout)]
+        if len(layers) == 1 and isinstance(layers[0], torch.nn.Linear):
+            return layers[0]
+    return None
+
+
+def forward_with_features(model, x):
+    """
+    Run the normal inference forward pass and also return the final feature map.
+
+    For EfficientNet13-style models this unrolls torchvision's EfficientNet.forward
+    (features -> avgpool -> flatten -> classifier) so cnn.features[-1]'s output is
+    available without a hook. Other models return (model(x), None).
+    """
+    cnn = getattr(model, "cnn", None)
+    if get_linear_head(model) is None or not (hasattr(cnn, "features") and hasattr(cnn, "avgpool")):
+        return model(x), None
+
+    feats = cnn.features(x)                          # [B,C,h,w]
+    pooled = torch.flatten(cnn.avgpool(feats), 1)    # [B,C]
+    out = model.fc(cnn.classifier(pooled))           # classifier is Identity
+    return out, feats
+
+
+class HealthWithFeatures(torch.nn.Module):
+    """
+    forward_with_features as a module, for graph export/tracing (ONNX, TorchScript, compile):
+    returns (outputs, final feature map), or just outputs for non-linear heads.
+    """
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, x):
+        out, feats = forward_with_features(self.model, x)
+        return out if feats is None else (out, feats)
+
+
+def closed_form_cam(model, feats, param_index):
+    """
+    CAM for a linear head on pooled features, no backward pass needed.
+    model is the health model or its Linear head itself.
+
+    d(out[p]) / d(A[c,i,j]) = W[p,c] / (h*w), so the Grad-CAM channel weights are
+    the Linear weights for param_index divided by h*w.
+    """
+    linear = model if isinstance(model, torch.nn.Linear) else get_linear_head(model)
+    if linear is None:
+        raise ValueError("closed_form_cam needs a linear head; use GradCAM instead.")
+
+    feats = feats.detach()
+    h, w = feats.shape[-2:]
+    weights = linear.weight[param_index].detach().to(feats.dtype) / (h * w)   # [C]
+    cam = (weights.view(1, -1, 1, 1) * feats).sum(dim=1, keepdim=True)
+    cam = torch.relu(cam)
+
+    cam -= cam.min()
+    cam /= (cam.max() + 1e-8)
+    return cam
+
+
 def overlay_cam(image, cam):
     img_np = np.array(image)
     cam = cam.squeeze().cpu().numpy()
@@ -81,12 +193,6 @@ def overlay_cam(image, cam):
 # Generate Grad-CAM
 # ============================================================
 
-def _get_supabase():
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_SERVICE_KEY")
-    return create_client(url, key)
-
-
 def generate_gradcam_for_image(model, image_path, save_path, param_index=0, input_tensor=None):
     device = get_device()
     model.to(device).eval() 
@@ -105,38 +211,28 @@ def generate_gradcam_for_image(model, image_path, save_path, param_index=0, inpu
         ])
         x = transform(original).unsqueeze(0).to(device)
 
-    target_layer = get_target_layer(model)
-    gradcam = GradCAM(model, target_layer)
-
-    # Forward pass
-    output = model(x)  # shape = (1,13)
-    score = output[0, param_index]
+    cam = get_gradcam_engine(model).generate(x, param_index)
+    return upload_cam_overlay(original, cam)
 
-    # Backward pass
-    model.zero_grad()
-    score.backward()
 
-    cam = gradcam.generate()
+def encode_cam_overlay(original, cam) -> bytes:
+    """Overlay cam on the original PIL image and encode it as PNG bytes."""
     overlay = overlay_cam(original, cam)
 
     # encode to PNG bytes in memory — no disk write
     overlay_bgr = cv2.cvtColor(overlay, cv2.COLOR_RGB2BGR)
     _, buffer = cv2.imencode(".png", overlay_bgr)
-    image_bytes = buffer.tobytes()
+    return buffer.tobytes()
+
+
+def new_overlay_name() -> str:
+    return f"{uuid.uuid4()}.png"
 
-    # upload to Supabase Storage
-    filename = f"{uuid.uuid4()}.png"
-    supabase = _get_supabase()
-    supabase.storage.from_("gradcam").upload(
-        filename,
-        image_bytes,
-        {"content-type": "image/png"}
-    )
 
-    # return permanent public URL
-    public_url = supabase.storage.from_("gradcam").get_public_url(filename)
-   
-    return public_url
+def upload_cam_overlay(original, cam):
+    """Overlay cam on the original PIL image and upload it; returns the public URL."""
+    image_bytes = encode_cam_overlay(original, cam)
+    return get_storage().upload(new_overlay_name(), image_bytes, "image/png")
 
 
 # ============================================================
@@ -144,9 +240,10 @@ def generate_gradcam_for_image(model, image_path, save_path, param_index=0, inpu
 # ============================================================
 
 def main():
+    cfg.ensure_dirs()
     device = get_device()
 
-    model = build_efficientnet(model_name=cfg.MODEL_NAME)
+    model = build_efficientnet(model_name=cfg.MODEL_NAME, pretrained=False)
     ckpt_path = os.path.join(cfg.CHECKPOINT_DIR, f"{cfg.MODEL_NAME}_best.pth")
     state = torch.load(ckpt_path, map_location=device)
     model.load_state_dict(state["model_state"])
@@ -0,0 +1,106 @@
+# backend/gradcam_jobs.py
+"""
+Background Grad-CAM job queue.
+/predict returns scores as soon as the models finish; overlays are rendered and
+uploaded by a bounded worker pool and polled through /gradcam/{job_id}.
+"""
+
+import os
+import sys
+import threading
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from core import config as cfg
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+class GradCAMJobQueue:
+    def __init__(self, max_workers=2, max_pending=64, max_jobs=1000):
+        self.max_workers = max_workers
+        self.max_jobs = max_jobs            # finished jobs kept for polling (oldest dropped first)
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()          # job_id -> {"status", "url", "error"}
+        self._executor = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="gradcam")
+            return self._executor
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queue fn(*args, **kwargs), which must return the overlay URL; returns the job id.
+        Blocks while max_pending jobs are already queued (back-pressure on /predict).
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._jobs[job_id] = {"status": PENDING, "url": None, "error": None}
+            self._evict()
+
+        self._slots.acquire()
+        try:
+            self._get_executor().submit(self._run, job_id, fn, args, kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        return job_id
+
+    def _run(self, job_id, fn, args, kwargs):
+        try:
+            url = fn(*args, **kwargs)
+            update = {"status": DONE, "url": url}
+        except Exception as e:
+            print(f"⚠️ GradCAM job {job_id} failed: {e}")
+            traceback.print_exc()
+            update = {"status": FAILED, "error": str(e)}
+        finally:
+            self._slots.release()
+
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(update)
+
+    def _evict(self):
+        # drop the oldest finished jobs beyond max_jobs; pending jobs are never dropped
+        excess = len(self._jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        for job_id in [j for j, job in self._jobs.items() if job["status"] != PENDING][:excess]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        """Return {"status", "url", "error"} for job_id, or None if unknown/expired."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def pending(self):
+        """Number of jobs not finished yet (backend.metrics queue depth)."""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job["status"] == PENDING)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+# global instance
+gradcam_jobs = GradCAMJobQueue(
+    max_workers=cfg.GRADCAM_WORKERS,
+    max_pending=cfg.GRADCAM_MAX_PENDING,
+    max_jobs=cfg.GRADCAM_JOB_RETENTION,
+)
@@ -0,0 +1,131 @@
+# backend/image_context.py
+"""
+Per-request image context: each uploaded image is decoded once and every /predict
+stage (models, feature extraction, Grad-CAM overlay, adaptive layer) reads the
+derivative it needs from here instead of re-opening the file.
+"""
+
+import io
+import os
+import sys
+from functools import lru_cache
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from core import config as cfg
+from core.augment import build_transforms
+from backend.image_features import resize_for_features, extract_image_features_from_array
+from backend.prediction_cache import content_hash, prediction_cache
+from backend.metrics import stage_seconds
+
+
+@lru_cache(maxsize=1)
+def get_inference_transform():
+    """Validation/test transform (resize to cfg.IMAGE_SIZE + normalize), built once."""
+    _, _, test_t = build_transforms(
+        image_size=cfg.IMAGE_SIZE,
+        mean=cfg.NORMALIZE_MEAN,
+        std=cfg.NORMALIZE_STD,
+        augment_cfg={}
+    )
+    return test_t
+
+
+class ImageContext:
+    """
+    One image, decoded once. Derivatives are computed lazily and cached:
+        image        → RGB PIL image, as the models and the Grad-CAM overlay see it
+        tensor       → [3,H,W] normalized cfg.IMAGE_SIZE tensor for the models
+        features_bgr → 256x256 BGR array for backend.image_features
+                       (EXIF orientation applied, matching cv2.imread)
+        features     → {"color", "shape", "imageHash"} dict
+        content_hash → SHA-256 of the encoded bytes (prediction cache key)
+    """
+
+    def __init__(self, path: str = None, name: str = None, data: bytes = None):
+        if path is None and data is None:
+            raise ValueError("ImageContext needs a path or encoded image bytes")
+        self.path = path
+        self.data = data  # encoded upload bytes (no temp file)
+        self.name = name or (os.path.basename(path) if path else "upload")
+        self._image = None
+        self._tensor = None
+        self._features_bgr = None
+        self._features = None
+        self._content_hash = None
+
+    @classmethod
+    def from_path(cls, path: str) -> "ImageContext":
+        return cls(path)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, name: str = None) -> "ImageContext":
+        """Build a context straight from an upload buffer, without writing it to disk."""
+        return cls(name=name, data=data)
+
+    @property
+    def source(self) -> str:
+        """Human-readable origin for log messages."""
+        return self.path or self.name
+
+    @property
+    def content_hash(self) -> str:
+        if self._content_hash is None:
+            if self.data is not None:
+                self._content_hash = content_hash(self.data)
+            else:
+                with open(self.path, "rb") as f:
+                    self._content_hash = content_hash(f.read())
+        return self._content_hash
+
+    def _decode(self) -> Image.Image:
+        img = Image.open(self.path if self.data is None else io.BytesIO(self.data))
+        if cfg.DECODE_MIN_SIZE and img.format == "JPEG":
+            # JPEG DCT scaling: decode at the smallest 1/2, 1/4, 1/8 scale that still
+            # covers every consumer (model input and the 256px feature image)
+            img.draft("RGB", (cfg.DECODE_MIN_SIZE, cfg.DECODE_MIN_SIZE))
+        img.load()
+        return img
+
+    @property
+    def image(self) -> Image.Image:
+        if self._image is None:
+            with stage_seconds.time(stage="decode"):
+                self._image = self._decode().convert("RGB")
+        return self._image
+
+    @property
+    def tensor(self):
+        if self._tensor is None:
+            self._tensor = get_inference_transform()(self.image)
+        return self._tensor
+
+    @property
+    def features_bgr(self) -> np.ndarray:
+        if self._features_bgr is None:
+            upright = ImageOps.exif_transpose(self.image)
+            bgr = np.ascontiguousarray(np.asarray(upright)[:, :, ::-1])
+            self._features_bgr = resize_for_features(bgr)
+        return self._features_bgr
+
+    @property
+    def features(self) -> dict:
+        if self._features is None:
+            # a repeated upload (e.g. /verify-transformer then /predict) is not decoded again
+            features = prediction_cache.get_features(self.content_hash)
+            if features is None:
+                with stage_seconds.time(stage="features"):
+                    features = extract_image_features_from_array(self.features_bgr)
+                prediction_cache.put_features(self.content_hash, features)
+            self._features = features
+        return self._features
+
+
+def as_image_contexts(images) -> list:
+    """Accept image paths and/or ImageContext objects; return ImageContext objects."""
+    return [img if isinstance(img, ImageContext) else ImageContext.from_path(img) for img in images]
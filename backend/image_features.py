@@ -4,11 +4,23 @@ Image feature extraction for transformer images.
 Extracts: color histogram, shape descriptors, and perceptual hash for later comparison.
 """
 
+import io
+import os
+import sys
 import cv2
 import numpy as np
 from PIL import Image
 import hashlib
 
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from backend.tracing import traced
+
+# All features are computed on images resized to this (width, height)
+FEATURE_SIZE = (256, 256)
+
 
 def extract_color_histogram(image: np.ndarray, bins: int = 64) -> list:
     """
@@ -100,9 +112,67 @@ def extract_image_features(image_path: str) -> dict:
     if image is None:
         raise ValueError(f"Could not read image: {image_path}")
     
-    # Resize to standard size for consistent feature extraction
-    standard_size = (256, 256)
-    image_resized = cv2.resize(image, standard_size)
+    return extract_image_features_from_array(image)
+
+
+def reduced_decode_flag(data, min_size: int) -> int:
+    """
+    Pick the cv2.imdecode flag that decodes a JPEG at the smallest DCT scale
+    (1/8, 1/4, 1/2) whose width and height both still cover min_size.
+    Non-JPEG input (or min_size=0/None) gets a plain full-resolution IMREAD_COLOR.
+    """
+    if not min_size:
+        return cv2.IMREAD_COLOR
+    
+    try:
+        # header only — Image.open does not decode pixels
+        with Image.open(io.BytesIO(data)) as im:
+            if im.format != "JPEG":
+                return cv2.IMREAD_COLOR
+            shortest = min(im.size)
+    except Exception:
+        return cv2.IMREAD_COLOR
+    
+    for factor, flag in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2)):
+        if shortest // factor >= min_size:
+            return flag
+    return cv2.IMREAD_COLOR
+
+
+@traced()
+def decode_image_bytes(data, min_size: int = None) -> np.ndarray:
+    """
+    Decode an encoded image (bytes / bytearray / memoryview) straight from memory
+    to a BGR array — same result as cv2.imread on the file, without the disk round trip.
+    With min_size, large JPEGs are decoded at a reduced scale that still covers it.
+    """
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), reduced_decode_flag(data, min_size))
+    
+    if image is None:
+        raise ValueError("Could not decode image bytes")
+    
+    return image
+
+
+def extract_image_features_from_bytes(data, min_size: int = None) -> dict:
+    """Same as extract_image_features, for an encoded image held in memory."""
+    return extract_image_features_from_array(decode_image_bytes(data, min_size))
+
+
+def resize_for_features(image: np.ndarray) -> np.ndarray:
+    """Resize a BGR image to the standard size used for consistent feature extraction."""
+    if image.shape[:2] == (FEATURE_SIZE[1], FEATURE_SIZE[0]):
+        return image
+    return cv2.resize(image, FEATURE_SIZE)
+
+
+@traced("extract_image_features")
+def extract_image_features_from_array(image: np.ndarray) -> dict:
+    """
+    Same as extract_image_features, for an already decoded BGR image
+    (any size; it is resized to FEATURE_SIZE unless it already matches).
+    """
+    image_resized = resize_for_features(image)
     
     features = {
         "color": extract_color_histogram(image_resized),
@@ -0,0 +1,165 @@
+# backend/inference_workers.py
+"""
+Multi-process inference serving mode (cfg.INFERENCE_PROCESSES > 0).
+
+The HTTP front process loads both models once, moves their weights into shared
+memory and then forks a pool of inference processes. The workers inherit the
+already-built modules, so every process maps the same weight pages: memory grows
+with the number of models, not models x workers. The front process only parses
+requests and runs the cheap endpoints; /predict's evaluate_transformer runs in a worker.
+
+Only the eager PyTorch path can be shared this way: ONNX Runtime sessions and
+frozen/compiled graphs would be rebuilt, with private weight copies, in every worker,
+so INFERENCE_BACKEND=onnx or INFERENCE_COMPILE != "none" is refused at startup.
+The parent never runs a forward before forking (each worker warms up itself), and a
+pool broken by a dying worker (e.g. OOM-killed) is re-forked on the next request.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from core import config as cfg
+
+_pool = None
+_lock = threading.Lock()
+_num_workers = 0
+_in_flight = 0  # /predict calls submitted to the pool and not answered yet
+
+
+def _init_worker():
+    """
+    Runs in each forked worker: drop thread pools inherited (threadless) from the
+    parent, then warm the shared models with this process's own torch threads.
+    """
+    import torch
+    from backend import storage
+    from backend.metrics import metrics
+    from backend.gradcam_jobs import gradcam_jobs
+    from backend.model_registry import model_registry
+
+    torch.set_num_threads(cfg.TORCH_NUM_THREADS or 1)
+    storage.ArtifactStorage._pool = None
+    gradcam_jobs._executor = None
+    model_registry._forwards = {}  # micro-batcher threads do not survive fork
+    metrics.drain()                # the parent's counts are reported by the parent
+    model_registry.warmup()
+
+
+def _ping(_=None):
+    return os.getpid()
+
+
+def _evaluate(images):
+    from backend.evaluate import evaluate_transformer
+    from backend.metrics import metrics
+
+    # Grad-CAM job state would live in the worker, where /gradcam/{job_id} can't see it
+    result = evaluate_transformer(images, gradcam_async=False)
+    # this request's stage timings / counters, merged into the front process's /metrics
+    return result, metrics.drain()
+
+
+def _check_supported():
+    """Refuse the backends whose state can't be shared by forking (see module docstring)."""
+    if cfg.INFERENCE_BACKEND != "torch" or cfg.INFERENCE_COMPILE != "none":
+        raise RuntimeError(
+            f"INFERENCE_PROCESSES={cfg.INFERENCE_PROCESSES} needs INFERENCE_BACKEND=torch and INFERENCE_COMPILE=none "
+            f"(got {cfg.INFERENCE_BACKEND!r} / {cfg.INFERENCE_COMPILE!r}): ONNX sessions and frozen/compiled graphs "
+            "are not shared between forked workers. Use INFERENCE_PROCESSES=0 with INFERENCE_WORKERS instead."
+        )
+
+
+def _fork_pool(num_workers):
+    pool = ProcessPoolExecutor(
+        max_workers=num_workers,
+        mp_context=multiprocessing.get_context("fork"),
+        initializer=_init_worker,
+    )
+    # fork every worker now, while the front process is still quiet
+    pids = set(pool.map(_ping, range(num_workers * 4)))
+    print(f"✅ {num_workers} inference worker process(es) ready: {sorted(pids)}")
+    return pool
+
+
+def start(num_workers: int):
+    """
+    Load and share the models, then fork num_workers inference processes.
+    Call once at startup, before serving (fork happens here, not per request).
+    """
+    global _pool, _num_workers
+    from backend.model_registry import model_registry
+
+    with _lock:
+        if _pool is not None:
+            return _pool
+
+        _check_supported()
+        # no warm-up forward here: torch's thread pools must not exist yet when we fork
+        if not model_registry.load(warmup=False):
+            return None  # no health model: /predict stays unavailable
+        model_registry.share_memory()
+
+        _num_workers = num_workers
+        _pool = _fork_pool(num_workers)
+        return _pool
+
+
+def _restart(broken):
+    """Replace the broken pool with freshly forked workers (once, however many requests saw it break)."""
+    global _pool
+    with _lock:
+        if _pool is broken:
+            print("⚠️ An inference worker died; re-forking the inference processes")
+            broken.shutdown(wait=False, cancel_futures=True)
+            _pool = _fork_pool(_num_workers)
+
+
+def is_running() -> bool:
+    return _pool is not None
+
+
+def queue_depth() -> int:
+    return _in_flight
+
+
+async def evaluate(images):
+    """
+    Await evaluate_transformer(images) in a worker process (Grad-CAM is always inline).
+    If the pool breaks under it, the pool is re-forked and the call retried once.
+    """
+    from backend.metrics import metrics
+
+    global _in_flight
+    loop = asyncio.get_running_loop()
+    _in_flight += 1  # event loop thread only
+    try:
+        for attempt in range(2):
+            pool = _pool
+            try:
+                result, drained = await loop.run_in_executor(pool, _evaluate, images)
+                break
+            except BrokenProcessPool:
+                await loop.run_in_executor(None, _restart, pool)
+                if attempt:
+                    raise RuntimeError("Inference worker process died twice while evaluating this request")
+    finally:
+        _in_flight -= 1
+    metrics.merge(drained)
+    return result
+
+
+def shutdown(wait: bool = False):
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,393 @@
+# backend/loadtest.py
+"""
+End-to-end load test of the FastAPI service, fully local and reproducible:
+
+    python backend/loadtest.py --requests 200 --concurrency 8 --images-per-request 3
+    python backend/loadtest.py --mix predict=1 --concurrency 16 --env INFERENCE_PROCESSES=2
+    python backend/loadtest.py --url http://localhost:8000 ...       # an already running server
+
+Unless --url is given it
+1. writes randomly initialized health / PMT checkpoints (seeded) plus a manifest into a
+   temp model mirror, the stand-in for the Supabase models bucket (MODEL_MIRROR_DIR),
+2. starts `uvicorn backend.api.main:app` on a free port with ARTIFACT_STORAGE=local
+   (Grad-CAM overlays go to a temp folder instead of the Supabase bucket), temp
+   OUTPUT_ROOT / ADJUSTMENTS_DIR, and waits for GET /ready,
+3. drives a weighted mix of multipart requests (/predict, /verify-transformer,
+   /extract-hashes, /submit-corrections) from --concurrency clients, using synthetic
+   JPEGs drawn from a pool of --distinct-images (small pools → prediction cache hits),
+4. reports per endpoint: throughput, p50/p95/p99 latency, errors, and the peak RSS of
+   the server (process tree) sampled while that endpoint had requests in flight.
+
+Results are printed and written to cfg.METRICS_DIR/loadtests/loadtest-<timestamp>.json.
+Forked INFERENCE_PROCESSES workers share weight pages, so the summed RSS overstates
+their real footprint.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+import numpy as np
+
+from core import config as cfg
+from core.dataset import PARAM_COLUMNS  # the scores /predict returns and /submit-corrections learns from
+from backend.benchmark import synthetic_image
+
+ENDPOINTS = ("predict", "verify-transformer", "extract-hashes", "submit-corrections")
+DEFAULT_MIX = "predict=4,verify-transformer=3,extract-hashes=2,submit-corrections=1"
+
+
+# -------------------------
+# Local stand-ins
+# -------------------------
+def write_random_checkpoints(mirror_dir, seed):
+    """Seeded random-init health / PMT checkpoints + manifest.json (the models bucket stand-in)."""
+    import torch
+    from models.efficientnet import build_efficientnet
+    from models.pmt_classifier import build_pmt_classifier
+    from backend.startup import write_manifest
+
+    torch.manual_seed(seed)
+    os.makedirs(mirror_dir, exist_ok=True)
+    health = build_efficientnet(model_name=cfg.MODEL_NAME, pretrained=False)
+    pmt = build_pmt_classifier(pretrained=False)
+    torch.save({"epoch": 0, "model_state": health.state_dict()}, os.path.join(mirror_dir, f"{cfg.MODEL_NAME}_best.pth"))
+    torch.save({"epoch": 0, "model_state": pmt.state_dict()}, os.path.join(mirror_dir, "pmt_classifier_best.pth"))
+    write_manifest(mirror_dir)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(work_dir, extra_env, port):
+    """uvicorn backend.api.main:app with every output and external service pointed at work_dir."""
+    mirror_dir = os.path.join(work_dir, "mirror")
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": ROOT_DIR + os.pathsep + env.get("PYTHONPATH", ""),
+        "OUTPUT_ROOT": os.path.join(work_dir, "outputs"),
+        "MODEL_MIRROR_DIR": mirror_dir,
+        "ARTIFACT_STORAGE": "local",
+        "ADJUSTMENTS_DIR": os.path.join(work_dir, "adjustments"),
+        "PREDICTION_CACHE_DIR": "",
+    })
+    env.update(extra_env)
+    os.makedirs(env["ADJUSTMENTS_DIR"], exist_ok=True)
+    log = open(os.path.join(work_dir, "server.log"), "w")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.api.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    return process, log
+
+
+def wait_ready(url, process=None, timeout=600):
+    import httpx
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode} (see server.log)")
+        try:
+            r = httpx.get(f"{url}/ready", timeout=2.0)
+            if r.status_code == 200:
+                return
+            if r.json().get("status") == "failed":
+                raise RuntimeError(f"Server failed to load the models: {r.json().get('error')}")
+        except httpx.TransportError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"{url}/ready did not turn 200 within {timeout}s")
+
+
+# -------------------------
+# RSS sampling (Linux /proc)
+# -------------------------
+def _children(pid):
+    children = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                children += [int(c) for c in f.read().split()]
+    except OSError:
+        pass
+    return children
+
+
+def tree_rss(pid):
+    """Summed VmRSS (bytes) of pid and its descendants."""
+    total, stack = 0, [pid]
+    while stack:
+        p = stack.pop()
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            continue
+        stack += _children(p)
+    return total
+
+
+class RssSampler:
+    """Samples the server's RSS every interval; the peak is attributed to every endpoint in flight."""
+
+    def __init__(self, pid, interval=0.05):
+        self.pid = pid
+        self.interval = interval
+        self.in_flight = {name: 0 for name in ENDPOINTS}
+        self.peak = {name: 0 for name in ENDPOINTS}
+        self.overall_peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="rss-sampler", daemon=True)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            rss = tree_rss(self.pid)
+            self.overall_peak = max(self.overall_peak, rss)
+            for name, count in list(self.in_flight.items()):
+                if count:
+                    self.peak[name] = max(self.peak[name], rss)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+# -------------------------
+# Traffic
+# -------------------------
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint in --mix: {name!r} (expected {ENDPOINTS})")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class TrafficGenerator:
+    """Seeded request payloads: synthetic JPEGs from a fixed pool and their real feature dicts."""
+
+    def __init__(self, seed, distinct_images, images_per_request):
+        import cv2
+        from backend.image_features import extract_image_features_from_bytes
+
+        np_rng = np.random.default_rng(seed)
+        self.rng = random.Random(seed)
+        self.images_per_request = images_per_request
+        self.images = []
+        for i in range(distinct_images):
+            image = synthetic_image(np_rng, height=960, width=1280)
+            self.images.append((f"img_{i}.jpg", cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()))
+        self.features = [extract_image_features_from_bytes(data) for _, data in self.images]
+
+    def _files(self, count=None):
+        picks = [self.rng.randrange(len(self.images)) for _ in range(count or self.images_per_request)]
+        return [("files", (self.images[i][0], self.images[i][1], "image/jpeg")) for i in picks], picks
+
+    def request(self, endpoint):
+        """(path, form data, files) for one request to endpoint."""
+        transformer_id = f"TX-{self.rng.randrange(50):03d}"
+        if endpoint == "predict":
+            files, _ = self._files()
+            data = {"transformer_id": transformer_id, "location": "load-test", "date": "2024-01-01", "time": "12:00"}
+        elif endpoint == "verify-transformer":
+            files, _ = self._files()
+            stored = [self.features[self.rng.randrange(len(self.features))] for _ in range(self.rng.randint(1, 10))]
+            data = {"stored_features": json.dumps(stored)}
+        elif endpoint == "extract-hashes":
+            files, _ = self._files()
+            data = {}
+        else:
+            files, _ = self._files(1)
+            original = [{"name": name, "score": round(self.rng.uniform(0, 6), 2)} for name in PARAM_COLUMNS]
+            corrected = [{"name": o["name"], "score": min(6.0, max(0.0, o["score"] + self.rng.uniform(-1, 1)))} for o in original]
+            data = {"transformer_id": transformer_id, "original_scores": json.dumps(original), "corrected_scores": json.dumps(corrected)}
+        return f"/{endpoint}", data, files
+
+
+async def run_load(url, traffic, mix, total_requests, concurrency, sampler=None, timeout=300.0):
+    """Fire total_requests mix-weighted requests from concurrency clients; returns per-endpoint samples."""
+    import httpx
+
+    names = list(mix)
+    plan = traffic.rng.choices(names, weights=[mix[n] for n in names], k=total_requests)
+    samples = {name: {"latencies": [], "errors": 0, "statuses": {}} for name in names}
+    queue = asyncio.Queue()
+    for endpoint in plan:
+        queue.put_nowait(endpoint)
+
+    async def client(http):
+        while True:
+            try:
+                endpoint = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            path, data, files = traffic.request(endpoint)
+            if sampler is not None:
+                sampler.in_flight[endpoint] += 1
+            start = time.perf_counter()
+            try:
+                r = await http.post(url + path, data=data, files=files)
+                status = r.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - start
+            if sampler is not None:
+                sampler.in_flight[endpoint] -= 1
+
+            s = samples[endpoint]
+            s["statuses"][str(status)] = s["statuses"].get(str(status), 0) + 1
+            if status == 200:
+                s["latencies"].append(elapsed)
+            else:
+                s["errors"] += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as http:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(http) for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+    return samples, wall
+
+
+def summarize(samples, wall, sampler=None):
+    report = {}
+    for endpoint, s in samples.items():
+        lat = np.asarray(s["latencies"]) * 1000
+        report[endpoint] = {
+            "requests": len(lat) + s["errors"],
+            "errors": s["errors"],
+            "statuses": s["statuses"],
+            "throughput_rps": len(lat) / wall if wall else 0.0,
+            "p50_ms": float(np.percentile(lat, 50)) if len(lat) else None,
+            "p95_ms": float(np.percentile(lat, 95)) if len(lat) else None,
+            "p99_ms": float(np.percentile(lat, 99)) if len(lat) else None,
+            "mean_ms": float(lat.mean()) if len(lat) else None,
+            "peak_rss_mb": sampler.peak[endpoint] / 2**20 if sampler is not None else None,
+        }
+    return report
+
+
+def print_report(report, wall, overall_peak_mb):
+    print(f"\n📊 Load test ({wall:.1f} s wall)")
+    print(f"  {'endpoint':<20} {'reqs':>6} {'err':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak RSS MB':>12}")
+    fmt = lambda v, spec: format(v, spec) if v is not None else "-"
+    for endpoint, r in report.items():
+        print(f"  {endpoint:<20} {r['requests']:>6} {r['errors']:>5} {r['throughput_rps']:>8.2f} "
+              f"{fmt(r['p50_ms'], '9.1f'):>9} {fmt(r['p95_ms'], '9.1f'):>9} {fmt(r['p99_ms'], '9.1f'):>9} "
+              f"{fmt(r['peak_rss_mb'], '12.1f'):>12}")
+    if overall_peak_mb is not None:
+        print(f"  server peak RSS: {overall_peak_mb:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the API with local stand-ins for Supabase and random checkpoints", allow_abbrev=False)
+    parser.add_argument("--requests", type=int, default=200, help="Total requests")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--images-per-request", type=int, default=3, help="Images per multipart request")
+    parser.add_argument("--distinct-images", type=int, default=20, help="Synthetic image pool size (smaller → more cache hits)")
+    parser.add_argument("--mix", type=str, default=DEFAULT_MIX, help=f"Endpoint weights (default {DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=cfg.SEED)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="Server environment override (repeatable)")
+    parser.add_argument("--url", type=str, default=None, help="Target a running server instead of starting one")
+    parser.add_argument("--pid", type=int, default=None, help="With --url: server PID for RSS sampling")
+    parser.add_argument("--output", type=str, default=None, help="Results JSON path")
+    parser.add_argument("--keep", action="store_true", help="Keep the temp work dir (server.log, outputs)")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    extra_env = dict(item.split("=", 1) for item in args.env)
+    traffic = TrafficGenerator(args.seed, args.distinct_images, args.images_per_request)
+
+    process = log = None
+    work = tempfile.TemporaryDirectory(prefix="loadtest-") if not args.keep else None
+    work_dir = work.name if work else tempfile.mkdtemp(prefix="loadtest-")
+    try:
+        if args.url:
+            url, pid = args.url.rstrip("/"), args.pid
+        else:
+            write_random_checkpoints(os.path.join(work_dir, "mirror"), args.seed)
+            port = _free_port()
+            url = f"http://127.0.0.1:{port}"
+            print(f"🚀 Starting server on {url} (work dir {work_dir})")
+            boot = time.perf_counter()
+            process, log = start_server(work_dir, extra_env, port)
+            pid = process.pid
+        wait_ready(url, process)
+        boot_seconds = time.perf_counter() - boot if process is not None else None
+        if boot_seconds is not None:
+            print(f"✅ Ready after {boot_seconds:.1f} s")
+
+        sampler = RssSampler(pid).start() if pid else None
+        try:
+            samples, wall = asyncio.run(run_load(url, traffic, mix, args.requests, args.concurrency, sampler))
+        finally:
+            if sampler is not None:
+                sampler.stop()
+
+        report = summarize(samples, wall, sampler)
+        overall_peak_mb = sampler.overall_peak / 2**20 if sampler is not None else None
+        print_report(report, wall, overall_peak_mb)
+
+        out_path = args.output or os.path.join(cfg.METRICS_DIR, "loadtests", f"loadtest-{time.strftime('%Y%m%d-%H%M%S')}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+        with open(out_path, "w") as f:
+            json.dump({
+                "meta": {
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "url": url if args.url else None,
+                    "requests": args.requests,
+                    "concurrency": args.concurrency,
+                    "images_per_request": args.images_per_request,
+                    "distinct_images": args.distinct_images,
+                    "mix": mix,
+                    "seed": args.seed,
+                    "server_env": extra_env,
+                    "boot_seconds": boot_seconds,
+                    "wall_seconds": wall,
+                    "server_peak_rss_mb": overall_peak_mb,
+                },
+                "endpoints": report,
+            }, f, indent=2)
+        print(f"Results saved to: {out_path}")
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            log.close()
+        if work is not None:
+            work.cleanup()
+        else:
+            print(f"Work dir kept: {work_dir}")
+
+
+if __name__ == "__main__":
+    main()
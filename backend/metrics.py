@@ -0,0 +1,263 @@
+# backend/metrics.py
+"""
+Process-wide metrics, exported by GET /metrics in the Prometheus text format
+(version 0.0.4), so a Prometheus server / Grafana agent can scrape the API directly.
+
+    health_indexer_stage_seconds{stage}          histogram: upload_read, decode, pmt_forward,
+                                                 health_forward, features, gradcam,
+                                                 overlay_encode, storage_upload
+    health_indexer_images_total{result}          counter: processed, non_pmt, error
+    health_indexer_adaptive_matches_total        counter: adaptive-layer corrections applied
+    health_indexer_prediction_cache_total{result} counter: hit, miss
+    health_indexer_queue_depth{queue}            gauge (read at scrape time)
+    health_indexer_model_memory_bytes{model,backend} gauge: weights of the loaded models (torch
+                                                 parameters + buffers, ONNX initializers)
+    process_resident_memory_bytes                gauge
+
+With INFERENCE_PROCESSES > 0, each worker process drains its counters and histograms
+into its /predict result and the front process merges them, so one scrape sees all.
+"""
+
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+PREFIX = "health_indexer_"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# seconds: sub-millisecond decodes up to multi-second CPU Grad-CAM / uploads
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {sorted(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}  # label values -> count
+
+    def inc(self, amount=1, **labels):
+        key = _labels_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def drain(self):
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values):
+        with self._lock:
+            for key, value in values.items():
+                self._values[key] = self._values.get(key, 0) + value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        if not values and not self.labelnames:
+            values = {(): 0}
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._values = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, value, **labels):
+        key = _labels_key(self.labelnames, labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            else:
+                state[len(self.buckets)] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of the with-block (also when it raises)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def drain(self):
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values):
+        with self._lock:
+            for key, other in values.items():
+                state = self._values.get(key)
+                if state is None:
+                    self._values[key] = list(other)
+                else:
+                    self._values[key] = [a + b for a, b in zip(state, other)]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            values = {key: list(state) for key, state in self._values.items()}
+        for key, state in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += count
+                le = (("le", _format_value(float(bound))),)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Read at scrape time: fn() returns a number, or {label value(s): number} for labelled gauges."""
+
+    def __init__(self, name, help, fn, labelnames=()):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        try:
+            values = self.fn()
+        except Exception as e:
+            print(f"⚠️ Metric {self.name} failed: {e}")
+            return lines
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in sorted(values.items()):
+            key = key if isinstance(key, tuple) else (key,)
+            lines.append(f"{self.name}{_format_labels(self.labelnames, tuple(map(str, key)))} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def drain(self):
+        """Counter/histogram values since the last drain (reset here); see merge()."""
+        return {m.name: m.drain() for m in self._metrics if not isinstance(m, Gauge)}
+
+    def merge(self, drained):
+        """Add another process's drain() into this registry."""
+        by_name = {m.name: m for m in self._metrics}
+        for name, values in (drained or {}).items():
+            if name in by_name:
+                by_name[name].merge(values)
+
+
+# -------------------------
+# Gauges
+# -------------------------
+def _queue_depths():
+    from backend import executors, inference_workers
+    from backend.gradcam_jobs import gradcam_jobs
+
+    depths = dict(executors.queue_depths())
+    depths["gradcam"] = gradcam_jobs.pending()
+    depths["inference_processes"] = inference_workers.queue_depth()
+    if "backend.model_registry" in sys.modules:  # never import torch just to scrape
+        depths.update(sys.modules["backend.model_registry"].model_registry.queue_depths())
+    return depths
+
+
+def _model_memory():
+    if "backend.model_registry" not in sys.modules:
+        return {}
+    return sys.modules["backend.model_registry"].model_registry.memory_bytes()
+
+
+def _resident_memory():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource  # peak RSS where /proc is unavailable (KiB on Linux, bytes on macOS)
+
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024
+
+
+# global instance
+metrics = MetricsRegistry()
+
+stage_seconds = metrics.register(Histogram(
+    f"{PREFIX}stage_seconds", "Duration of each /predict stage in seconds.", labelnames=("stage",)
+))
+images_total = metrics.register(Counter(
+    f"{PREFIX}images_total", "Uploaded images evaluated by /predict, by outcome.", labelnames=("result",)
+))
+adaptive_matches_total = metrics.register(Counter(
+    f"{PREFIX}adaptive_matches_total", "Predictions corrected by the adaptive layer's closest past case."
+))
+prediction_cache_total = metrics.register(Counter(
+    f"{PREFIX}prediction_cache_total", "Prediction cache lookups, by result.", labelnames=("result",)
+))
+metrics.register(Gauge(
+    f"{PREFIX}queue_depth", "Work items waiting in each queue.", _queue_depths, labelnames=("queue",)
+))
+metrics.register(Gauge(
+    f"{PREFIX}model_memory_bytes", "Weight bytes of each loaded model, by inference backend.", _model_memory,
+    labelnames=("model", "backend"),
+))
+metrics.register(Gauge(
+    "process_resident_memory_bytes", "Resident memory size in bytes.", _resident_memory
+))
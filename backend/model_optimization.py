@@ -0,0 +1,101 @@
+# backend/model_optimization.py
+"""
+Graph-level inference optimizations for the health and PMT models (cfg.INFERENCE_COMPILE):
+
+    "none"     eager PyTorch (default)
+    "freeze"   channels_last + TorchScript trace + torch.jit.freeze (weights inlined,
+               Conv-BN folded). The frozen graph is saved as
+               COMPILE_CACHE_DIR/<name>-<checkpoint digest>.pt; later starts just load it.
+    "compile"  channels_last + torch.compile with Inductor freezing (Conv-BN folding).
+               Inductor's on-disk caches go to COMPILE_CACHE_DIR/inductor-<checkpoint digest>,
+               so a restart with the same weights reuses the compiled kernels.
+
+Anything that fails to trace/compile falls back to eager with a warning.
+"""
+
+import os
+import sys
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+import torch
+
+from core import config as cfg
+
+MODES = ("none", "freeze", "compile")
+
+
+def to_channels_last(model):
+    """NHWC weights: the depthwise convolutions in EfficientNet run much faster on CPU."""
+    return model.to(memory_format=torch.channels_last)
+
+
+def _channels_last_input(fn):
+    return lambda x: fn(x.contiguous(memory_format=torch.channels_last))
+
+
+def _freeze(module, name, digest, device):
+    path = os.path.join(cfg.COMPILE_CACHE_DIR, f"{name}-{digest}.pt")
+    if os.path.exists(path):
+        frozen = torch.jit.load(path, map_location=device)
+        print(f"✅ Loaded frozen {name} graph: {path}")
+        return frozen
+
+    example = torch.randn(2, 3, cfg.IMAGE_SIZE, cfg.IMAGE_SIZE, device=device).contiguous(memory_format=torch.channels_last)
+    with torch.no_grad():
+        traced = torch.jit.trace(module.eval(), example, check_trace=False)
+        # freezing inlines the weights and folds Conv-BN (and conv-add/mul) chains;
+        # optimize_for_inference's MKLDNN prepacking is skipped: it can't be saved/reloaded
+        frozen = torch.jit.freeze(traced)
+
+    os.makedirs(cfg.COMPILE_CACHE_DIR, exist_ok=True)
+    tmp = f"{path}.tmp"
+    torch.jit.save(frozen, tmp)
+    os.replace(tmp, path)
+    print(f"✅ Froze {name} graph: {path}")
+    return frozen
+
+
+def _compile(module, name, digest):
+    import torch._inductor.config as inductor_config
+
+    # persistent FX-graph / kernel caches, one directory per set of weights
+    os.environ["TORCHINDUCTOR_CACHE_DIR"] = os.path.join(cfg.COMPILE_CACHE_DIR, f"inductor-{digest}")
+    inductor_config.freezing = True  # treat weights as constants: folds Conv-BN, prepacks
+    print(f"⚙️ torch.compile({name}) (compiled on first use)")
+    return torch.compile(module.eval())
+
+
+def optimize_for_inference(module, name, digest, device, mode=None):
+    """
+    Return a callable equivalent to module(x) for [N,3,H,W] inference batches, optimized
+    per mode (default cfg.INFERENCE_COMPILE). module's parameters are converted to
+    channels_last in place (harmless for other eager users such as Grad-CAM).
+    """
+    mode = mode or cfg.INFERENCE_COMPILE
+    if mode == "none":
+        return module
+    if mode not in MODES:
+        print(f"⚠️ Unknown INFERENCE_COMPILE={mode!r} (expected one of {MODES}). Using eager.")
+        return module
+
+    try:
+        to_channels_last(module)
+        if mode == "freeze":
+            return _channels_last_input(_freeze(module, name, digest, device))
+        return _channels_last_input(_compile(module, name, digest))
+    except Exception as e:
+        print(f"⚠️ Could not {mode} {name}: {e}. Using eager.")
+        return module
+
+
+def compile_for_training(model):
+    """
+    torch.compile for backend/train.py --compile (channels_last + Inductor).
+    Returns the compiled wrapper; keep saving checkpoints from the original model
+    (the wrapper's state_dict keys carry an "_orig_mod." prefix).
+    """
+    to_channels_last(model)
+    return torch.compile(model)
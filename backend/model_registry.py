@@ -0,0 +1,349 @@
+# backend/model_registry.py
+"""
+Process-wide model registry for inference.
+Builds the health regression model and the PMT classifier once (at app startup)
+and hands the same eval-mode modules to every request.
+"""
+
+import hashlib
+import os
+import sys
+import threading
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+import torch
+
+from core import config as cfg
+from core.utils import get_device, autocast, resolve_weights_path
+from backend.batching import MicroBatcher, forward_in_chunks
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._device = None
+        self._health_model = None
+        self._pmt_model = None
+        self._forwards = {}  # "health" / "pmt" -> batched forward callable
+        self._checkpoint_digest = None
+        self._onnx = {}  # "health" / "pmt" -> OnnxModel or None (INFERENCE_BACKEND=onnx)
+        self._compiled = {}  # "health" / "pmt" -> (model, frozen/compiled callable)
+        self._failed = {}  # "health" / "pmt" -> checkpoint stamp of the last failed load
+        self._health_head = None  # Linear head for the closed-form CAM under ONNX serving
+
+    @property
+    def device(self):
+        if self._device is None:
+            self._device = get_device()
+        return self._device
+
+    @property
+    def health_ckpt(self):
+        return os.path.join(cfg.CHECKPOINT_DIR, f"{cfg.MODEL_NAME}_best.pth")
+
+    @property
+    def pmt_ckpt(self):
+        return os.path.join(cfg.CHECKPOINT_DIR, "pmt_classifier_best.pth")
+
+    @property
+    def checkpoint_digest(self):
+        """
+        SHA-256 over the health and PMT checkpoint files (computed once per load).
+        Prediction cache keys include it, so replaced weights never serve stale results.
+        """
+        if self._checkpoint_digest is None:
+            with self._lock:
+                if self._checkpoint_digest is None:
+                    # the backend and precision change the outputs slightly (INT8 more than that)
+                    digest = hashlib.sha256(f"{cfg.MODEL_NAME}:{cfg.INFERENCE_BACKEND}:{cfg.ONNX_INT8}:{cfg.MIXED_PRECISION}:{cfg.INFERENCE_COMPILE}".encode())
+                    for path in (resolve_weights_path(self.health_ckpt), resolve_weights_path(self.pmt_ckpt)):
+                        if os.path.exists(path):
+                            with open(path, "rb") as f:
+                                for block in iter(lambda: f.read(1 << 20), b""):
+                                    digest.update(block)
+                        digest.update(b"\0")
+                    self._checkpoint_digest = digest.hexdigest()[:16]
+        return self._checkpoint_digest
+
+    def _load_health(self):
+        # imported lazily: backend.evaluate imports this module
+        from backend.evaluate import load_model
+
+        try:
+            model = load_model(self.health_ckpt)
+        except FileNotFoundError as e:
+            print(f"❌ Health model not available: {e}")
+            return None
+
+        # inference only: no parameter grads (Grad-CAM only needs activation grads)
+        model.to(self.device).eval()
+        model.requires_grad_(False)
+        return model
+
+    def _load_pmt(self):
+        from backend.evaluate import load_pmt_model
+
+        try:
+            model = load_pmt_model()
+            model.requires_grad_(False)
+            print("✅ PMT Classifier loaded for image filtering.")
+            return model
+        except Exception as e:
+            print(f"⚠️ Warning: Could not load PMT model: {e}. All images will be processed.")
+            return None
+
+    def load(self, warmup=True):
+        """
+        Build and warm both models (called once at startup, see backend.startup.readiness).
+        warmup=False skips the dummy forward (backend.inference_workers forks first).
+        Returns whether the health model is available.
+        """
+        # with a usable ONNX export the PyTorch model is not built at all (the health
+        # model's is loaded on demand, for gradient Grad-CAM only)
+        if self._get_onnx("health", self.health_ckpt) is None:
+            self.get_health_model()
+        if self._get_onnx("pmt", self.pmt_ckpt) is None:
+            self.get_pmt_model()
+        self.checkpoint_digest  # hash the checkpoints now, not on the first request
+        if warmup:
+            self.warmup()  # first request doesn't pay for lazy init (or tracing/compilation)
+        return self.health_available()
+
+    def warmup(self):
+        """Run one dummy batch through both forwards (pays tracing/compilation at startup)."""
+        x = torch.zeros(1, 3, cfg.IMAGE_SIZE, cfg.IMAGE_SIZE, device=self.device)
+        with torch.no_grad():
+            if self.health_available():
+                self.health_forward()(x)
+            if self.pmt_available():
+                self.pmt_forward()(x)
+
+    def health_available(self):
+        """Whether health_forward() can run (ORT session or PyTorch model)."""
+        return self._get_onnx("health", self.health_ckpt) is not None or self.get_health_model() is not None
+
+    def pmt_available(self):
+        """Whether pmt_forward() can run; without it every image is treated as a PMT."""
+        return self._get_onnx("pmt", self.pmt_ckpt) is not None or self.get_pmt_model() is not None
+
+    def health_head(self):
+        """
+        The health model's Linear head, for the closed-form CAM (None for other heads).
+        Under ONNX serving only the head is kept, not the whole PyTorch model.
+        """
+        from backend.gradCam import get_linear_head
+
+        if self._health_model is not None or self._get_onnx("health", self.health_ckpt) is None:
+            model = self.get_health_model()
+            return None if model is None else get_linear_head(model)
+        if self._health_head is None:
+            with self._lock:
+                if self._health_head is None:
+                    model = self._load_health()
+                    self._health_head = None if model is None else get_linear_head(model)
+        return self._health_head
+
+    def get_health_model(self):
+        """
+        Return the shared health model, or None when its checkpoint is missing.
+        A missing or unloadable checkpoint is retried once the file appears or changes
+        (it may still be downloading), not on every request.
+        """
+        if self._health_model is None and self._should_retry("health", self.health_ckpt):
+            with self._lock:
+                if self._health_model is None and self._should_retry("health", self.health_ckpt):
+                    self._health_model = self._load_health()
+                    self._record_failure("health", self.health_ckpt, self._health_model)
+                    self._checkpoint_digest = None  # a (re)loaded checkpoint changes the digest
+        return self._health_model
+
+    def get_pmt_model(self):
+        """
+        Return the shared PMT classifier, or None if it could not be loaded (retried
+        like the health model's, when the checkpoint file changes).
+        """
+        if self._pmt_model is None and self._should_retry("pmt", self.pmt_ckpt):
+            with self._lock:
+                if self._pmt_model is None and self._should_retry("pmt", self.pmt_ckpt):
+                    self._pmt_model = self._load_pmt()
+                    self._record_failure("pmt", self.pmt_ckpt, self._pmt_model)
+                    self._checkpoint_digest = None  # a (re)loaded checkpoint changes the digest
+        return self._pmt_model
+
+    @staticmethod
+    def _checkpoint_stamp(ckpt_path):
+        """(file, mtime) the serving path would load for ckpt_path; (file, None) if missing."""
+        path = resolve_weights_path(ckpt_path)
+        try:
+            return path, os.path.getmtime(path)
+        except OSError:
+            return path, None
+
+    def _should_retry(self, name, ckpt_path):
+        """A failed load is only retried once its checkpoint file appears or changes."""
+        failed = self._failed.get(name)
+        return failed is None or failed != self._checkpoint_stamp(ckpt_path)
+
+    def _record_failure(self, name, ckpt_path, model):
+        if model is None:
+            self._failed[name] = self._checkpoint_stamp(ckpt_path)
+        else:
+            self._failed.pop(name, None)
+
+    def share_memory(self):
+        """
+        Move the loaded models' weights into shared memory, so forked inference
+        workers (backend.inference_workers) map the same pages instead of copies.
+        """
+        for model in (self._health_model, self._pmt_model):
+            if model is not None:
+                model.share_memory()
+
+    def memory_bytes(self):
+        """
+        {("health" / "pmt", "torch" / "onnx"): weight bytes} of the loaded models
+        (backend.metrics): parameters + buffers of PyTorch models, initializers of ORT
+        sessions. Models that are not loaded are omitted.
+        """
+        sizes = {}
+        for name, model in (("health", self._health_model), ("pmt", self._pmt_model)):
+            if model is not None:
+                tensors = list(model.parameters()) + list(model.buffers())
+                sizes[(name, "torch")] = sum(t.numel() * t.element_size() for t in tensors)
+        for name, session in list(self._onnx.items()):
+            if session is not None:
+                sizes[(name, "onnx")] = session.weight_bytes()
+        return sizes
+
+    def queue_depths(self):
+        """{"microbatch_<name>": waiting requests} for the micro-batched forwards (backend.metrics)."""
+        with self._lock:
+            forwards = dict(self._forwards)
+        return {f"microbatch_{name}": fn.pending for name, (_, fn) in forwards.items() if isinstance(fn, MicroBatcher)}
+
+    def _autocast(self, forward):
+        """
+        Wrap a torch forward in bf16 autocast when cfg.MIXED_PRECISION is on, returning
+        float32 outputs. Autocast is thread-local, so it has to live inside the forward
+        (micro-batcher threads call it too).
+        """
+        if not cfg.MIXED_PRECISION:
+            return forward
+
+        def run(batch):
+            with autocast(self.device):
+                out = forward(batch)
+            if isinstance(out, tuple):
+                return tuple(None if o is None else o.float() for o in out)
+            return out.float()
+        return run
+
+    def _optimized(self, name, model, module):
+        """
+        module (model itself or a wrapper around it) after the cfg.INFERENCE_COMPILE
+        optimizations (backend.model_optimization), built once per loaded model.
+        """
+        entry = self._compiled.get(name)
+        if entry is not None and entry[0] is model:
+            return entry[1]
+
+        from backend.model_optimization import optimize_for_inference
+
+        digest = self.checkpoint_digest  # takes the lock itself
+        with self._lock:
+            entry = self._compiled.get(name)
+            if entry is None or entry[0] is not model:
+                entry = (model, optimize_for_inference(module, name, digest, self.device))
+                self._compiled[name] = entry
+        return entry[1]
+
+    def _get_forward(self, name, model, forward):
+        """
+        Batched forward for model: a MicroBatcher shared by all requests when
+        cfg.MICROBATCH_WAIT_MS > 0 and cfg.INFERENCE_WORKERS > 1 (with one inference worker
+        only one request at a time could reach it), otherwise a direct call in
+        INFERENCE_BATCH_SIZE chunks.
+        """
+        with self._lock:
+            entry = self._forwards.get(name)
+            if entry is not None and entry[0] is model:
+                return entry[1]
+
+            if entry is not None and isinstance(entry[1], MicroBatcher):
+                entry[1].stop()
+
+            if cfg.MICROBATCH_WAIT_MS > 0 and cfg.INFERENCE_WORKERS > 1:
+                fn = MicroBatcher(
+                    forward,
+                    max_batch_size=cfg.MICROBATCH_MAX_SIZE,
+                    max_wait_ms=cfg.MICROBATCH_WAIT_MS,
+                    name=f"microbatch-{name}",
+                )
+            else:
+                fn = lambda batch: forward_in_chunks(forward, batch)
+            self._forwards[name] = (model, fn)
+            return fn
+
+    def _get_onnx(self, name, ckpt_path):
+        """ORT session for name when cfg.INFERENCE_BACKEND == "onnx" (None → PyTorch)."""
+        if cfg.INFERENCE_BACKEND != "onnx":
+            return None
+        if name not in self._onnx:
+            from backend.onnx_backend import load_onnx_model
+
+            with self._lock:
+                if name not in self._onnx:
+                    self._onnx[name] = load_onnx_model(ckpt_path)
+        return self._onnx[name]
+
+    def health_forward(self):
+        """[N,3,H,W] -> (outputs [N,13], final feature maps or None) for the health model."""
+        onnx_model = self._get_onnx("health", self.health_ckpt)
+        if onnx_model is not None:
+            from backend import onnx_backend
+
+            return self._get_forward("health", onnx_model, onnx_backend.health_forward(onnx_model))
+
+        from backend.gradCam import HealthWithFeatures
+
+        model = self.get_health_model()
+        graph = self._optimized("health", model, HealthWithFeatures(model))
+        return self._get_forward("health", model, self._autocast(lambda x: _health_outputs(graph(x))))
+
+    def pmt_forward(self):
+        """[N,3,H,W] -> PMT logits [N,2]."""
+        onnx_model = self._get_onnx("pmt", self.pmt_ckpt)
+        if onnx_model is not None:
+            from backend import onnx_backend
+
+            return self._get_forward("pmt", onnx_model, onnx_backend.pmt_forward(onnx_model))
+
+        model = self.get_pmt_model()
+        return self._get_forward("pmt", model, self._autocast(self._optimized("pmt", model, model)))
+
+    def clear(self):
+        """Drop the cached models (e.g. after replacing checkpoints on disk)."""
+        with self._lock:
+            for _, fn in self._forwards.values():
+                if isinstance(fn, MicroBatcher):
+                    fn.stop()
+            self._forwards = {}
+            self._onnx = {}
+            self._compiled = {}
+            self._failed = {}
+            self._health_head = None
+            self._health_model = None
+            self._pmt_model = None
+            self._checkpoint_digest = None
+
+
+def _health_outputs(out):
+    # HealthWithFeatures returns (outputs, feature maps) for linear heads, outputs otherwise
+    return out if isinstance(out, tuple) else (out, None)
+
+
+# global instance
+model_registry = ModelRegistry()
@@ -0,0 +1,201 @@
+# backend/onnx_backend.py
+"""
+ONNX Runtime backend for the health model (EfficientNet13) and the PMT classifier.
+
+Export (writes <checkpoint>.onnx next to each .pth, dynamic batch dimension, and
+checks ORT against PyTorch within cfg.ONNX_ATOL):
+
+    python backend/onnx_backend.py --model all
+
+Serve with INFERENCE_BACKEND=onnx: the registry's batched forwards then run through
+onnxruntime on CPU (with ONNX_INT8=1, the quantized models from backend/quantization.py).
+No PyTorch model is built while a verified, current export is served: the exported
+health graph also returns the final feature map, so the closed-form CAM only needs the
+Linear head (model_registry.health_head()). The full PyTorch health model is loaded on
+demand only for gradient Grad-CAM, i.e. health heads without a linear layer.
+"""
+
+import os
+import sys
+import argparse
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+import numpy as np
+import torch
+
+from core import config as cfg
+
+OPSET = 17
+
+
+def onnx_path(ckpt_path: str) -> str:
+    """outputs/checkpoints/x_best.pth -> outputs/checkpoints/x_best.onnx"""
+    return os.path.splitext(ckpt_path)[0] + ".onnx"
+
+
+# -------------------------
+# Export
+# -------------------------
+def export_onnx(model, path, output_names):
+    """Export an eval-mode model with a dynamic batch dimension (atomic write)."""
+    model = model.cpu().eval()
+    dummy = torch.randn(2, 3, cfg.IMAGE_SIZE, cfg.IMAGE_SIZE)
+    tmp = f"{path}.tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (dummy,),
+            tmp,
+            input_names=["input"],
+            output_names=output_names,
+            dynamic_axes={name: {0: "batch"} for name in ["input", *output_names]},
+            opset_version=OPSET,
+            dynamo=False,
+        )
+    os.replace(tmp, path)
+    print(f"✅ Exported ONNX model: {path}")
+    return path
+
+
+def export_health(ckpt_path=None):
+    from backend.evaluate import load_model
+    from backend.gradCam import get_linear_head, HealthWithFeatures
+
+    ckpt_path = ckpt_path or cfg.CHECKPOINT_PATH
+    model = load_model(ckpt_path).eval()
+    # the feature map output is only exported for linear heads (closed-form CAM)
+    outputs = ["outputs", "features"] if get_linear_head(model) is not None else ["outputs"]
+    path = export_onnx(HealthWithFeatures(model), onnx_path(ckpt_path), outputs)
+    verify_onnx(HealthWithFeatures(model), path)
+    return path
+
+
+def export_pmt(ckpt_path=None):
+    from backend.evaluate import load_pmt_model
+
+    ckpt_path = ckpt_path or os.path.join(cfg.CHECKPOINT_DIR, "pmt_classifier_best.pth")
+    model = load_pmt_model().cpu().eval()
+    path = export_onnx(model, onnx_path(ckpt_path), ["logits"])
+    verify_onnx(model, path)
+    return path
+
+
+def verify_onnx(model, path, atol=None, batch_size=3):
+    """
+    Compare every ORT output with PyTorch on a random batch (a batch size other
+    than the export's, to exercise the dynamic axis). Raises ValueError beyond atol.
+    """
+    atol = cfg.ONNX_ATOL if atol is None else atol
+    x = torch.randn(batch_size, 3, cfg.IMAGE_SIZE, cfg.IMAGE_SIZE)
+    with torch.no_grad():
+        expected = model.cpu().eval()(x)
+    expected = expected if isinstance(expected, tuple) else (expected,)
+    actual = OnnxModel(path).run(x)
+
+    max_diff = max(float((e - a).abs().max()) for e, a in zip(expected, actual))
+    print(f"🔎 ONNX vs PyTorch max abs diff: {max_diff:.2e} (tolerance {atol:.0e})")
+    if max_diff > atol:
+        raise ValueError(f"ONNX outputs differ from PyTorch by {max_diff:.2e} (> {atol:.0e}): {path}")
+    return max_diff
+
+
+# -------------------------
+# Runtime
+# -------------------------
+class OnnxModel:
+    """onnxruntime CPU session taking/returning torch tensors."""
+
+    def __init__(self, path, num_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.path = path
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.output_names = [o.name for o in self.session.get_outputs()]
+        self._weight_bytes = None
+
+    def weight_bytes(self):
+        """Bytes of the graph's initializers (the weights the session holds), read once."""
+        if self._weight_bytes is None:
+            import onnx
+            from onnx.helper import tensor_dtype_to_np_dtype
+
+            graph = onnx.load(self.path, load_external_data=False).graph
+            self._weight_bytes = sum(
+                int(np.prod(t.dims)) * tensor_dtype_to_np_dtype(t.data_type).itemsize for t in graph.initializer
+            )
+        return self._weight_bytes
+
+    def run(self, batch):
+        """[N,3,H,W] tensor -> list of output tensors (in export order)."""
+        x = batch.detach().cpu().numpy().astype(np.float32, copy=False)
+        return [torch.from_numpy(a) for a in self.session.run(None, {self.input_name: x})]
+
+
+def load_onnx_model(ckpt_path):
+    """
+    The ORT session for ckpt_path's exported graph, or None (with a warning) when
+    it is missing or older than the checkpoint, so the caller stays on PyTorch.
+    """
+    path = onnx_path(ckpt_path)
+    if cfg.ONNX_INT8:
+        from backend.quantization import int8_approved, int8_path
+
+        if int8_approved(ckpt_path):
+            path = int8_path(ckpt_path)
+        else:
+            print(f"⚠️ No passing INT8 accuracy report for {ckpt_path} (run backend/quantization.py). Using float ONNX.")
+    if not os.path.exists(path):
+        print(f"⚠️ ONNX model not found: {path} (run backend/onnx_backend.py). Using PyTorch.")
+        return None
+    if os.path.exists(ckpt_path) and os.path.getmtime(path) < os.path.getmtime(ckpt_path):
+        print(f"⚠️ ONNX model is older than {ckpt_path}; re-export it. Using PyTorch.")
+        return None
+    try:
+        model = OnnxModel(path, num_threads=cfg.TORCH_NUM_THREADS)
+    except Exception as e:
+        print(f"⚠️ Could not load ONNX model {path}: {e}. Using PyTorch.")
+        return None
+    print(f"✅ ONNX Runtime session ready: {path}")
+    return model
+
+
+def health_forward(onnx_model):
+    """Batched forward with the registry's health contract: (outputs, feature maps or None)."""
+    def forward(batch):
+        outputs = onnx_model.run(batch)
+        return outputs[0], (outputs[1] if len(outputs) > 1 else None)
+    return forward
+
+
+def pmt_forward(onnx_model):
+    return lambda batch: onnx_model.run(batch)[0]
+
+
+# -------------------------
+# CLI
+# -------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Export the inference models to ONNX and check them against PyTorch")
+    parser.add_argument(
+        "--model", type=str, default="all",
+        choices=["regression", "classifier", "all"],
+        help="Which checkpoint to export"
+    )
+    args = parser.parse_args()
+
+    if args.model in ("regression", "all"):
+        export_health()
+    if args.model in ("classifier", "all"):
+        export_pmt()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# backend/prediction_cache.py
+"""
+Content-hash cache for /predict and the feature endpoints.
+Re-submitted photos (retries, re-analysis, /verify-transformer followed by /predict)
+are recognised by the SHA-256 of their bytes and skip decoding and the models.
+
+    prediction entries → PMT gate result, raw 13-parameter outputs, Grad-CAM overlay URL
+                         (keyed by image hash + checkpoint digest: new weights never hit old entries)
+    feature entries    → {"color", "shape", "imageHash"} (keyed by image hash only)
+
+Entries live in a bounded in-memory LRU and, with cfg.PREDICTION_CACHE_DIR set,
+in one JSON file each on disk (shared by processes and kept across restarts).
+"""
+
+import copy
+import hashlib
+import json
+import os
+import sys
+import threading
+import uuid
+from collections import OrderedDict
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from core import config as cfg
+from backend.metrics import prediction_cache_total
+
+
+def content_hash(data: bytes) -> str:
+    """SHA-256 hex digest of encoded image bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class PredictionCache:
+    def __init__(self, max_entries=1024, cache_dir=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir or None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> JSON-serialisable entry, most recent last
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    # ---------- keys ----------
+    @staticmethod
+    def prediction_key(image_hash: str, model_digest: str) -> str:
+        # decode scaling changes the model input, so it is part of the key too
+        return f"pred:{model_digest}:{cfg.DECODE_MIN_SIZE}:{image_hash}"
+
+    @staticmethod
+    def features_key(image_hash: str) -> str:
+        return f"feat:{cfg.DECODE_MIN_SIZE}:{image_hash}"
+
+    # ---------- storage ----------
+    def _disk_path(self, key):
+        name = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.cache_dir, name[:2], f"{name}.json")
+
+    def _read_disk(self, key):
+        try:
+            with open(self._disk_path(key), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"⚠️ Prediction cache read failed: {e}")
+            return None
+
+    def _write_disk(self, key, entry):
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp, path)  # readers never see a half-written entry
+        except Exception as e:
+            print(f"⚠️ Prediction cache write failed: {e}")
+
+    def _remember(self, key, entry):
+        # caller holds self._lock
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key, count=True):
+        """Return a copy of the entry for key, or None. count=False leaves hits/misses alone."""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is None and self.cache_dir:
+            entry = self._read_disk(key)
+            if entry is not None:
+                with self._lock:
+                    self._remember(key, entry)
+
+        if count:
+            with self._lock:
+                if entry is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+            prediction_cache_total.inc(result="miss" if entry is None else "hit")
+        # callers may mutate what they get back (e.g. add to a response)
+        return copy.deepcopy(entry) if entry is not None else None
+
+    def put(self, key, entry):
+        if not self.enabled:
+            return
+        entry = copy.deepcopy(entry)
+        with self._lock:
+            self._remember(key, entry)
+        if self.cache_dir:
+            self._write_disk(key, entry)
+
+    def update(self, key, **fields):
+        """Merge fields into an existing entry (e.g. a Grad-CAM URL that arrives later)."""
+        entry = self.get(key, count=False)
+        if entry is not None:
+            entry.update(fields)
+            self.put(key, entry)
+
+    # ---------- convenience ----------
+    def get_features(self, image_hash: str):
+        return self.get(self.features_key(image_hash))
+
+    def put_features(self, image_hash: str, features: dict):
+        self.put(self.features_key(image_hash), features)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": self.hits / lookups if lookups else 0.0,
+                "diskDir": self.cache_dir,
+            }
+
+    def clear(self):
+        """Forget the in-memory entries and reset the counters (disk entries are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# global instance
+prediction_cache = PredictionCache(
+    max_entries=cfg.PREDICTION_CACHE_SIZE,
+    cache_dir=cfg.PREDICTION_CACHE_DIR,
+)
@@ -0,0 +1,273 @@
+# backend/quantization.py
+"""
+INT8 post-training static quantization of the ONNX models, with an accuracy guardrail.
+
+    python backend/quantization.py --model all
+
+1. exports the float ONNX models if needed (backend/onnx_backend.py)
+2. calibrates activation ranges on a sample of val.csv (health model) and of the
+   classifier val folder (PMT model), then writes <checkpoint>.int8.onnx
+3. compares float PyTorch vs INT8 on the test sets: per-parameter MAE (test.csv)
+   and PMT F1 (classifier test folder), plus latency and model size, and writes
+   the report to <checkpoint>.int8.json and metrics/quantization_report.json
+
+The serving side (INFERENCE_BACKEND=onnx, ONNX_INT8=1) only loads an INT8 model whose
+report passed cfg.QUANT_MAX_MAE_INCREASE / cfg.QUANT_MAX_F1_DROP.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Subset
+
+from core import config as cfg
+from core.dataset import TransformerHealthDataset, PMTClassifierDataset
+from core.utils import resolve_weights_path
+from backend.image_context import get_inference_transform
+from backend.onnx_backend import OnnxModel, onnx_path, export_health, export_pmt
+
+PMT_CKPT = os.path.join(cfg.CHECKPOINT_DIR, "pmt_classifier_best.pth")
+
+
+def int8_path(ckpt_path: str) -> str:
+    return os.path.splitext(ckpt_path)[0] + ".int8.onnx"
+
+
+def report_path(ckpt_path: str) -> str:
+    return os.path.splitext(ckpt_path)[0] + ".int8.json"
+
+
+# -------------------------
+# Calibration + quantization
+# -------------------------
+def _sample_loader(dataset, num_samples, batch_size=None):
+    """First num_samples of a shuffled (fixed seed) dataset."""
+    g = torch.Generator().manual_seed(0)
+    indices = torch.randperm(len(dataset), generator=g)[:num_samples].tolist()
+    return DataLoader(Subset(dataset, indices), batch_size=batch_size or cfg.BATCH_SIZE, shuffle=False, num_workers=0)
+
+
+def _calibration_reader(loader):
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self):
+            self._batches = iter(loader)
+
+        def get_next(self):
+            batch = next(self._batches, None)
+            if batch is None:
+                return None
+            return {"input": batch[0].numpy()}
+
+    return _Reader()
+
+
+def quantize_model(float_onnx, out_path, calibration_loader):
+    """Static INT8 quantization (QDQ, per-channel weights) calibrated on calibration_loader."""
+    from onnxruntime.quantization import quantize_static, QuantFormat, QuantType
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    prepared = f"{out_path}.prep.onnx"
+    tmp = f"{out_path}.tmp"
+    try:
+        quant_pre_process(float_onnx, prepared)  # shape inference + graph cleanup
+        quantize_static(
+            prepared,
+            tmp,
+            _calibration_reader(calibration_loader),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,                 # depthwise convs lose too much per-tensor
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+        )
+        os.replace(tmp, out_path)
+    finally:
+        for path in (prepared, tmp):
+            if os.path.exists(path):
+                os.remove(path)
+    print(f"✅ INT8 model written: {out_path}")
+    return out_path
+
+
+# -------------------------
+# Accuracy report
+# -------------------------
+def _predict(forward, loader):
+    """Run forward over loader; returns (predictions, targets, seconds per image)."""
+    preds, targets, elapsed = [], [], 0.0
+    with torch.no_grad():
+        for imgs, y in loader:
+            start = time.perf_counter()
+            out = forward(imgs)
+            elapsed += time.perf_counter() - start
+            preds.append(out.float().cpu())
+            targets.append(torch.as_tensor(y))
+    n = sum(len(t) for t in targets)
+    return torch.cat(preds).numpy(), torch.cat(targets).numpy(), elapsed / max(n, 1)
+
+
+def _size_mb(path):
+    return os.path.getsize(path) / 2**20
+
+
+def _write_report(ckpt_path, report):
+    with open(report_path(ckpt_path), "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def quantize_health(num_samples=None):
+    from backend.evaluate import load_model, regression_metrics, PARAM_COLUMNS
+
+    ckpt = cfg.CHECKPOINT_PATH
+    num_samples = num_samples or cfg.QUANT_CALIBRATION_SAMPLES
+    float_onnx = onnx_path(ckpt)
+    if not os.path.exists(float_onnx) or os.path.getmtime(float_onnx) < os.path.getmtime(resolve_weights_path(ckpt)):
+        export_health(ckpt)
+
+    val_ds = TransformerHealthDataset(cfg.VAL_CSV, transform=get_inference_transform())
+    quantize_model(float_onnx, int8_path(ckpt), _sample_loader(val_ds, num_samples))
+
+    test_ds = TransformerHealthDataset(cfg.TEST_CSV, transform=get_inference_transform())
+    test_loader = DataLoader(test_ds, batch_size=cfg.BATCH_SIZE, shuffle=False, num_workers=0)
+    model = load_model(ckpt).cpu().eval()
+    int8 = OnnxModel(int8_path(ckpt), num_threads=cfg.TORCH_NUM_THREADS)
+
+    float_preds, trues, float_latency = _predict(model, test_loader)
+    int8_preds, _, int8_latency = _predict(lambda x: int8.run(x)[0], test_loader)
+    float_m = regression_metrics(trues, float_preds)
+    int8_m = regression_metrics(trues, int8_preds)
+
+    mae_increase = float(int8_m["overall_mae_0_6"] - float_m["overall_mae_0_6"])
+    return _write_report(ckpt, {
+        "model": cfg.MODEL_NAME,
+        "int8_model": int8_path(ckpt),
+        "int8_mtime": os.path.getmtime(int8_path(ckpt)),
+        "calibration_samples": min(num_samples, len(val_ds)),
+        "test_samples": len(test_ds),
+        "float_overall_mae": float(float_m["overall_mae_0_6"]),
+        "int8_overall_mae": float(int8_m["overall_mae_0_6"]),
+        "mae_increase": mae_increase,
+        "per_param_mae": {
+            name: {"float": float(f), "int8": float(q)}
+            for name, f, q in zip(PARAM_COLUMNS, float_m["per_param_mae_0_6"], int8_m["per_param_mae_0_6"])
+        },
+        "float_ms_per_image": float_latency * 1000,
+        "int8_ms_per_image": int8_latency * 1000,
+        "float_size_mb": _size_mb(float_onnx),
+        "int8_size_mb": _size_mb(int8_path(ckpt)),
+        "passed": mae_increase <= cfg.QUANT_MAX_MAE_INCREASE,
+    })
+
+
+def quantize_pmt(num_samples=None):
+    from backend.evaluate import load_pmt_model, classification_metrics
+
+    num_samples = num_samples or cfg.QUANT_CALIBRATION_SAMPLES
+    float_onnx = onnx_path(PMT_CKPT)
+    if not os.path.exists(float_onnx) or os.path.getmtime(float_onnx) < os.path.getmtime(resolve_weights_path(PMT_CKPT)):
+        export_pmt(PMT_CKPT)
+
+    # the regression val.csv only holds PMT photos; calibrate on both classes instead
+    val_ds = PMTClassifierDataset(cfg.CLASSIFIER_VAL_DIR, transform=get_inference_transform())
+    quantize_model(float_onnx, int8_path(PMT_CKPT), _sample_loader(val_ds, num_samples))
+
+    test_ds = PMTClassifierDataset(cfg.CLASSIFIER_TEST_DIR, transform=get_inference_transform())
+    test_loader = DataLoader(test_ds, batch_size=cfg.BATCH_SIZE, shuffle=False, num_workers=0)
+    model = load_pmt_model().cpu().eval()
+    int8 = OnnxModel(int8_path(PMT_CKPT), num_threads=cfg.TORCH_NUM_THREADS)
+
+    float_logits, labels, float_latency = _predict(model, test_loader)
+    int8_logits, _, int8_latency = _predict(lambda x: int8.run(x)[0], test_loader)
+    float_m = classification_metrics(labels, float_logits.argmax(axis=1))
+    int8_m = classification_metrics(labels, int8_logits.argmax(axis=1))
+
+    f1_drop = float(float_m["f1"] - int8_m["f1"])
+    return _write_report(PMT_CKPT, {
+        "model": "pmt_classifier",
+        "int8_model": int8_path(PMT_CKPT),
+        "int8_mtime": os.path.getmtime(int8_path(PMT_CKPT)),
+        "calibration_samples": min(num_samples, len(val_ds)),
+        "test_samples": len(test_ds),
+        "float_f1": float(float_m["f1"]),
+        "int8_f1": float(int8_m["f1"]),
+        "f1_drop": f1_drop,
+        "float_accuracy": float(float_m["accuracy"]),
+        "int8_accuracy": float(int8_m["accuracy"]),
+        "decision_agreement": float(np.mean(float_logits.argmax(axis=1) == int8_logits.argmax(axis=1))),
+        "float_ms_per_image": float_latency * 1000,
+        "int8_ms_per_image": int8_latency * 1000,
+        "float_size_mb": _size_mb(float_onnx),
+        "int8_size_mb": _size_mb(int8_path(PMT_CKPT)),
+        "passed": f1_drop <= cfg.QUANT_MAX_F1_DROP,
+    })
+
+
+def int8_approved(ckpt_path: str) -> bool:
+    """True when ckpt_path's INT8 model exists and its accuracy report passed."""
+    path = int8_path(ckpt_path)
+    try:
+        with open(report_path(ckpt_path), "r") as f:
+            report = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return False
+    if not os.path.exists(path) or (os.path.exists(ckpt_path) and os.path.getmtime(path) < os.path.getmtime(ckpt_path)):
+        return False
+    # a re-quantized model needs a fresh report
+    return bool(report.get("passed")) and report.get("int8_mtime") == os.path.getmtime(path)
+
+
+def _print_report(report):
+    print(f"\n📊 INT8 report: {report['model']} ({report['test_samples']} test images)")
+    if "per_param_mae" in report:
+        print(f"Overall MAE (0–6): float {report['float_overall_mae']:.4f} → int8 {report['int8_overall_mae']:.4f} "
+              f"(+{report['mae_increase']:.4f}, limit {cfg.QUANT_MAX_MAE_INCREASE})")
+        for name, m in report["per_param_mae"].items():
+            print(f"  {name}: {m['float']:.4f} → {m['int8']:.4f}")
+    else:
+        print(f"F1: float {report['float_f1']:.4f} → int8 {report['int8_f1']:.4f} "
+              f"(-{report['f1_drop']:.4f}, limit {cfg.QUANT_MAX_F1_DROP}); "
+              f"decision agreement {report['decision_agreement']:.2%}")
+    print(f"Latency: {report['float_ms_per_image']:.1f} → {report['int8_ms_per_image']:.1f} ms/image (float = PyTorch)")
+    print(f"Size: {report['float_size_mb']:.1f} → {report['int8_size_mb']:.1f} MB")
+    print("✅ Passed: INT8 can be served" if report["passed"] else "❌ Failed: INT8 will not be served")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="INT8-quantize the ONNX models and report the accuracy cost")
+    parser.add_argument(
+        "--model", type=str, default="all",
+        choices=["regression", "classifier", "all"],
+        help="Which model to quantize"
+    )
+    parser.add_argument("--samples", type=int, default=None, help="Calibration images (default cfg.QUANT_CALIBRATION_SAMPLES)")
+    args = parser.parse_args()
+
+    reports = {}
+    if args.model in ("regression", "all"):
+        reports["regression"] = quantize_health(args.samples)
+    if args.model in ("classifier", "all"):
+        reports["classifier"] = quantize_pmt(args.samples)
+
+    for report in reports.values():
+        _print_report(report)
+
+    os.makedirs(cfg.METRICS_DIR, exist_ok=True)
+    out_path = os.path.join(cfg.METRICS_DIR, "quantization_report.json")
+    with open(out_path, "w") as f:
+        json.dump(reports, f, indent=2)
+    print(f"Report saved to: {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,9 +5,17 @@ Uses histogram correlation for color and cosine similarity for shape.
 Includes perceptual hash comparison for additional accuracy.
 """
 
+import os
+import sys
 import numpy as np
 from typing import List, Dict, Tuple
 
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from backend.tracing import traced
+
 # Thresholds for transformer verification
 SAME_TRANSFORMER_THRESHOLD = 0.80  # Score >= 0.80 → Match ✅
 NEW_ANGLE_ZONE_MIN = 0.60          # Score 0.60-0.79 → Grey zone, ask user ⚠️
@@ -275,6 +283,7 @@ def compare_transformer_features(
     return (round(min_score, 4), status, details)
 
 
+@traced()
 def verify_transformer_images(
     new_features_list: List[Dict],
     stored_features_list: List[Dict]
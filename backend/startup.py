@@ -1,49 +1,324 @@
 
 """
-runs when the container boots on Render. 
+runs when the container boots on Render.
 Since your .pth files are gitignored and not in the repo, the container starts with an empty checkpoints/ folder.
- This script downloads all three models from Supabase models bucket before FastAPI starts accepting requests.
+ This script downloads the models from the Supabase models bucket (or a local mirror directory) into
+ cfg.CHECKPOINT_DIR. The API runs it in a background thread: cheap endpoints are served right away
+ and GET /ready turns 200 once the models are downloaded, verified, loaded and warm.
+ A failed attempt is retried with exponential backoff (cfg.MODEL_LOAD_RETRY_S).
+
+ Every file is streamed to a temp file, checked against the bucket's manifest.json
+ ({filename: {"sha256", "size"}}) and atomically renamed, so a truncated download is never used.
+ Files already on disk are re-verified against the manifest and re-downloaded on mismatch.
+
+    python backend/startup.py                    # download now (blocking)
+    python backend/startup.py --write-manifest   # manifest.json for the local checkpoints, to upload with them
 
 """
 
 import os
-from supabase import create_client
+import sys
+import json
+import hashlib
+import argparse
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
 load_dotenv(os.path.join(os.path.dirname(__file__), ".env"))
 
+from core import config as cfg
+
 MODELS = [
-    # "custom_cnn_best.pth", not used in pipeline 
+    # "custom_cnn_best.pth", not used in pipeline
     "efficientnet_b0_best.pth",
     "pmt_classifier_best.pth",
 ]
 
-def download_models():
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_SERVICE_KEY")
+MANIFEST = "manifest.json"
+CHUNK_SIZE = 1 << 20
+
+
+# -------------------------
+# Sources
+# -------------------------
+class SupabaseModelSource:
+    """The Supabase "models" bucket; files are streamed through signed URLs."""
+
+    def __init__(self, bucket=None):
+        from supabase import create_client
+
+        self.bucket = bucket or cfg.MODEL_BUCKET
+        self.client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_KEY"))
+
+    def read_bytes(self, name):
+        return self.client.storage.from_(self.bucket).download(name)
+
+    def stream(self, name, out):
+        """Call out(chunk) for each chunk of name's bytes."""
+        import httpx
+
+        signed = self.client.storage.from_(self.bucket).create_signed_url(name, 600)
+        url = signed.get("signedURL") or signed.get("signedUrl")
+        with httpx.stream("GET", url, timeout=60.0, follow_redirects=True) as response:
+            response.raise_for_status()
+            for chunk in response.iter_bytes(CHUNK_SIZE):
+                out(chunk)
+
+    def __str__(self):
+        return f"Supabase bucket '{self.bucket}'"
+
+
+class LocalMirrorSource:
+    """A directory laid out like the bucket (offline tests, air-gapped deployments)."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def read_bytes(self, name):
+        with open(os.path.join(self.root, name), "rb") as f:
+            return f.read()
+
+    def stream(self, name, out):
+        with open(os.path.join(self.root, name), "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                out(chunk)
+
+    def __str__(self):
+        return f"mirror {self.root}"
+
+
+def get_model_source():
+    """cfg.MODEL_MIRROR_DIR if set, else Supabase (None when it is not configured)."""
+    if cfg.MODEL_MIRROR_DIR:
+        return LocalMirrorSource(cfg.MODEL_MIRROR_DIR)
+    if not os.getenv("SUPABASE_URL") or not os.getenv("SUPABASE_SERVICE_KEY"):
+        return None
+    return SupabaseModelSource()
+
+
+# -------------------------
+# Download + verification
+# -------------------------
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _matches(path, entry):
+    """entry: manifest entry or None (no manifest → any non-empty file is accepted)."""
+    if not os.path.exists(path):
+        return False
+    size = os.path.getsize(path)
+    if entry is None:
+        return size > 0
+    return size == entry["size"] and sha256_file(path) == entry["sha256"]
+
+
+def download_file(source, name, dest_dir, entry=None):
+    """
+    Stream name into dest_dir via a temp file, verify size/sha256 against entry,
+    then atomically rename it into place. Raises on any failure (nothing is left behind).
+    """
+    path = os.path.join(dest_dir, name)
+    tmp = f"{path}.{uuid.uuid4().hex}.part"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp, "wb") as f:
+            def write(chunk):
+                nonlocal size
+                f.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+            source.stream(name, write)
 
-    if not url or not key:
+        if size == 0:
+            raise IOError(f"{name}: empty download")
+        if entry is not None and (size != entry["size"] or digest.hexdigest() != entry["sha256"]):
+            raise IOError(f"{name}: checksum mismatch ({size} bytes, sha256 {digest.hexdigest()[:12]}…)")
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return path
+
+
+def _load_manifest(source):
+    try:
+        return json.loads(source.read_bytes(MANIFEST))
+    except Exception as e:
+        print(f"⚠️ No model manifest in {source} ({e}); downloads will not be checksum-verified")
+        return None
+
+
+def _candidates(checkpoint, manifest):
+    # prefer the slim weights-only export (backend/export_weights.py), fall back to the .pth
+    slim = os.path.splitext(checkpoint)[0] + ".safetensors"
+    names = [slim, checkpoint]
+    if manifest is not None:
+        names = [n for n in names if n in manifest]
+    return names
+
+
+def _fetch_model(source, checkpoint, manifest, dest_dir):
+    names = _candidates(checkpoint, manifest)
+    for name in names:
+        entry = manifest.get(name) if manifest else None
+        if _matches(os.path.join(dest_dir, name), entry):
+            print(f"✅ Already exists, skipping: {name}")
+            return name
+    if manifest is None:
+        # offline (or unverifiable) and already on disk: keep what we have
+        for name in names:
+            if os.path.exists(os.path.join(dest_dir, name)):
+                return name
+
+    last_error = None
+    for name in names:
+        try:
+            print(f"⬇️  Downloading {name} from {source}...")
+            download_file(source, name, dest_dir, manifest.get(name) if manifest else None)
+            print(f"✅ Downloaded: {name}")
+            return name
+        except Exception as e:
+            print(f"❌ Failed to download {name}: {e}")
+            last_error = e
+    raise last_error or FileNotFoundError(f"{checkpoint} is not in the manifest")
+
+
+def download_models(source=None, dest_dir=None):
+    """
+    Fetch every model in MODELS concurrently. Returns {checkpoint: local file name};
+    raises if any model could not be fetched (None source → nothing to do).
+    """
+    source = source or get_model_source()
+    dest_dir = dest_dir or cfg.CHECKPOINT_DIR
+    if source is None:
         print("❌ SUPABASE_URL or SUPABASE_SERVICE_KEY not set — skipping model download")
-        return
+        return {}
+
+    os.makedirs(dest_dir, exist_ok=True)
+    manifest = _load_manifest(source)
+    with ThreadPoolExecutor(max_workers=cfg.MODEL_DOWNLOAD_WORKERS, thread_name_prefix="download") as pool:
+        futures = {c: pool.submit(_fetch_model, source, c, manifest, dest_dir) for c in MODELS}
+        errors = {}
+        fetched = {}
+        for checkpoint, future in futures.items():
+            try:
+                fetched[checkpoint] = future.result()
+            except Exception as e:
+                errors[checkpoint] = e
+    if errors:
+        raise RuntimeError(f"Model download failed: {errors}")
+    return fetched
+
 
-    supabase = create_client(url, key)
-    os.makedirs("outputs/checkpoints", exist_ok=True)
+def write_manifest(src_dir=None):
+    """manifest.json for the checkpoints / slim exports in src_dir (upload it next to them)."""
+    src_dir = src_dir or cfg.CHECKPOINT_DIR
+    manifest = {}
+    for checkpoint in MODELS:
+        for name in (checkpoint, os.path.splitext(checkpoint)[0] + ".safetensors"):
+            path = os.path.join(src_dir, name)
+            if os.path.exists(path):
+                manifest[name] = {"sha256": sha256_file(path), "size": os.path.getsize(path)}
+    out_path = os.path.join(src_dir, MANIFEST)
+    with open(out_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"✅ Manifest written: {out_path} ({len(manifest)} files)")
+    return manifest
 
-    for filename in MODELS:
-        local_path = os.path.join("outputs/checkpoints", filename)
 
-        if os.path.exists(local_path):
-            print(f"✅ Already exists, skipping: {filename}")
-            continue
+# -------------------------
+# Background preparation + readiness (GET /ready)
+# -------------------------
+class Readiness:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = {"ready": False, "status": "starting", "error": None, "attempt": 0, "retry_in": None}
+        self._thread = None
 
+    def _set(self, **fields):
+        with self._lock:
+            self._state.update(fields)
+
+    @property
+    def ready(self):
+        return self._state["ready"]
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._state)
+
+    def start(self, load_fn):
+        """
+        Download, then load_fn() (build + warm the models; returns whether the health
+        model is available), in a background thread.
+        """
+        with self._lock:
+            if self._thread is not None:
+                return self._thread
+            self._thread = threading.Thread(target=self._run, args=(load_fn,), name="model-startup", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def _run(self, load_fn):
+        delay = cfg.MODEL_LOAD_RETRY_S
+        attempt = 1
+        while not self._attempt(load_fn, attempt):
+            if delay <= 0:
+                return
+            print(f"🔁 Retrying the model download + load in {delay:g}s")
+            self._set(retry_in=delay)
+            time.sleep(delay)
+            delay = min(delay * 2, cfg.MODEL_LOAD_RETRY_MAX_S)
+            attempt += 1
+
+    def _attempt(self, load_fn, attempt):
+        """One download + load; True once the models are ready."""
+        self._set(status="downloading", attempt=attempt, retry_in=None)
+        download_error = None
+        try:
+            download_models()
+        except Exception as e:
+            # files that are already on disk may still be usable
+            print(f"❌ {e}")
+            download_error = str(e)
+
+        self._set(status="loading")
         try:
-            print(f"⬇️  Downloading {filename} from Supabase...")
-            data = supabase.storage.from_("models").download(filename)
-            with open(local_path, "wb") as f:
-                f.write(data)
-            print(f"✅ Downloaded: {filename}")
+            if not load_fn():
+                raise RuntimeError(download_error or "health model checkpoint not available")
         except Exception as e:
-            print(f"❌ Failed to download {filename}: {e}")
+            traceback.print_exc()
+            self._set(status="failed", error=str(e))
+            return False
+        self._set(ready=True, status="ready", error=None)
+        print("✅ Models ready")
+        return True
+
+
+# global instance
+readiness = Readiness()
+
 
 if __name__ == "__main__":
-    download_models()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Download (or write the manifest for) the serving models")
+    parser.add_argument("--write-manifest", action="store_true", help="Write manifest.json for the local checkpoints")
+    args = parser.parse_args()
+
+    if args.write_manifest:
+        write_manifest()
+    else:
+        download_models()
@@ -0,0 +1,144 @@
+# backend/storage.py
+"""
+Artifact storage for Grad-CAM overlays.
+
+Backends (selected with cfg.ARTIFACT_STORAGE):
+    "supabase" → public "gradcam" bucket, one pooled client per process (default)
+    "local"    → files under cfg.GRADCAM_DIR, served by the API's /outputs/gradcam mount
+    "memory"   → in-process dict, for tests and offline benchmarks
+"""
+
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from core import config as cfg
+
+
+class ArtifactStorage:
+    """Base class: subclasses implement upload(); upload_many() fans out over a shared pool."""
+
+    _pool = None
+    _pool_lock = threading.Lock()
+
+    def upload(self, name: str, data: bytes, content_type: str = "image/png") -> str:
+        """Store data under name and return its public URL."""
+        raise NotImplementedError
+
+    @staticmethod
+    def _get_pool():
+        with ArtifactStorage._pool_lock:
+            if ArtifactStorage._pool is None:
+                ArtifactStorage._pool = ThreadPoolExecutor(
+                    max_workers=cfg.STORAGE_UPLOAD_WORKERS, thread_name_prefix="upload"
+                )
+            return ArtifactStorage._pool
+
+    def upload_many(self, items, content_type: str = "image/png") -> list:
+        """
+        Upload [(name, data), ...] concurrently.
+        Returns one entry per item, in order: the URL, or the Exception that upload raised.
+        """
+        if len(items) <= 1:
+            results = []
+            for name, data in items:
+                try:
+                    results.append(self.upload(name, data, content_type))
+                except Exception as e:
+                    results.append(e)
+            return results
+
+        futures = [self._get_pool().submit(self.upload, name, data, content_type) for name, data in items]
+        results = []
+        for f in futures:
+            try:
+                results.append(f.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+class SupabaseStorage(ArtifactStorage):
+    def __init__(self, bucket: str = "gradcam"):
+        self.bucket = bucket
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        # one client (and its HTTP connection pool) per process instead of one per overlay
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from supabase import create_client
+
+                    self._client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_KEY"))
+        return self._client
+
+    def upload(self, name, data, content_type="image/png"):
+        bucket = self._get_client().storage.from_(self.bucket)
+        bucket.upload(name, data, {"content-type": content_type})
+        # return permanent public URL
+        return bucket.get_public_url(name)
+
+
+class LocalStorage(ArtifactStorage):
+    def __init__(self, root_dir: str = None, base_url: str = None):
+        self.root_dir = root_dir or cfg.GRADCAM_DIR
+        self.base_url = (base_url or cfg.PUBLIC_BASE_URL).rstrip("/")
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    def upload(self, name, data, content_type="image/png"):
+        path = os.path.join(self.root_dir, name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        # served by the API's /outputs/gradcam StaticFiles mount
+        return f"{self.base_url}/outputs/gradcam/{name}"
+
+
+class MemoryStorage(ArtifactStorage):
+    def __init__(self):
+        self.objects = {}  # name -> (bytes, content_type)
+        self._lock = threading.Lock()
+
+    def upload(self, name, data, content_type="image/png"):
+        with self._lock:
+            self.objects[name] = (bytes(data), content_type)
+        return f"memory://gradcam/{name}"
+
+
+_BACKENDS = {
+    "supabase": SupabaseStorage,
+    "local": LocalStorage,
+    "memory": MemoryStorage,
+}
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> ArtifactStorage:
+    """Return the process-wide storage backend selected by cfg.ARTIFACT_STORAGE."""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                name = cfg.ARTIFACT_STORAGE
+                if name not in _BACKENDS:
+                    raise ValueError(f"❌ Unknown ARTIFACT_STORAGE: {name} (expected one of {list(_BACKENDS)})")
+                _storage = _BACKENDS[name]()
+    return _storage
+
+
+def set_storage(storage: ArtifactStorage):
+    """Replace the process-wide backend (e.g. MemoryStorage() in tests)."""
+    global _storage
+    with _storage_lock:
+        _storage = storage
@@ -0,0 +1,40 @@
+import pytest
+import torch
+
+from core import config as cfg
+from models.efficientnet import build_efficientnet
+from models.pmt_classifier import build_pmt_classifier
+from backend.model_registry import ModelRegistry
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    """Registry serving random-init eval-mode models through eager PyTorch, 2 rows per forward."""
+    for name, value in {
+        "CHECKPOINT_DIR": str(tmp_path),
+        "INFERENCE_BACKEND": "torch",
+        "INFERENCE_COMPILE": "none",
+        "MIXED_PRECISION": False,
+        "MICROBATCH_WAIT_MS": 0,
+        "INFERENCE_BATCH_SIZE": 2,
+    }.items():
+        monkeypatch.setattr(cfg, name, value)
+    torch.manual_seed(0)
+    registry = ModelRegistry()
+    registry._health_model = build_efficientnet(pretrained=False).eval()
+    registry._pmt_model = build_pmt_classifier(pretrained=False).eval()
+    return registry
+
+
+def test_batched_forward_matches_single_images(registry):
+    batch = torch.randn(5, 3, cfg.IMAGE_SIZE, cfg.IMAGE_SIZE)  # 3 chunks: 2 + 2 + 1
+    with torch.no_grad():
+        outs, feats = registry.health_forward()(batch)
+        logits = registry.pmt_forward()(batch)
+
+        for i in range(batch.size(0)):
+            x = batch[i:i + 1]
+            single_outs, single_feats = registry.health_forward()(x)
+            torch.testing.assert_close(outs[i:i + 1], single_outs, atol=1e-5, rtol=1e-4)
+            torch.testing.assert_close(feats[i:i + 1], single_feats, atol=1e-5, rtol=1e-4)
+            torch.testing.assert_close(logits[i:i + 1], registry.pmt_forward()(x), atol=1e-5, rtol=1e-4)
@@ -0,0 +1,60 @@
+import json
+import os
+
+import pytest
+
+from core import config as cfg
+from backend import inference_workers
+
+
+@pytest.fixture
+def profile(tmp_path, monkeypatch):
+    """Write a profile for this host; cfg's settings are restored afterwards."""
+    for name in cfg.PROFILE_SETTINGS:
+        monkeypatch.delenv(name, raising=False)
+        monkeypatch.setattr(cfg, name, getattr(cfg, name))
+    monkeypatch.setattr(cfg, "INFERENCE_BACKEND", "torch")
+    monkeypatch.setattr(cfg, "INFERENCE_COMPILE", "none")
+    path = tmp_path / "deployment_profile.json"
+    monkeypatch.setattr(cfg, "DEPLOYMENT_PROFILE", str(path))
+
+    def write(settings, **fields):
+        data = {"model": cfg.MODEL_NAME, "host": {"cpu_count": os.cpu_count()}, "settings": settings, **fields}
+        path.write_text(json.dumps(data))
+    return write
+
+
+SETTINGS = {"TORCH_NUM_THREADS": 2, "INFERENCE_COMPILE": "freeze", "INFERENCE_BACKEND": "onnx", "INFERENCE_BATCH_SIZE": 8}
+
+
+def test_profile_applied(profile, monkeypatch):
+    monkeypatch.setattr(cfg, "INFERENCE_PROCESSES", 0)
+    profile(SETTINGS, inference_processes=0)
+    assert cfg.apply_deployment_profile() == SETTINGS
+    assert cfg.INFERENCE_COMPILE == "freeze"
+
+
+def test_environment_wins(profile, monkeypatch):
+    monkeypatch.setattr(cfg, "INFERENCE_PROCESSES", 0)
+    monkeypatch.setenv("INFERENCE_BATCH_SIZE", "16")
+    profile(SETTINGS, inference_processes=0)
+    assert "INFERENCE_BATCH_SIZE" not in cfg.apply_deployment_profile()
+
+
+def test_multiprocess_serving_skips_unshareable_backends(profile, monkeypatch):
+    # a profile without inference_processes (or tuned with 0 and copied over) must not
+    # select a backend the forked workers refuse: readiness would fail for good
+    monkeypatch.setattr(cfg, "INFERENCE_PROCESSES", 2)
+    profile(SETTINGS)
+    applied = cfg.apply_deployment_profile()
+
+    assert applied == {"TORCH_NUM_THREADS": 2, "INFERENCE_BATCH_SIZE": 8}
+    assert (cfg.INFERENCE_BACKEND, cfg.INFERENCE_COMPILE) == ("torch", "none")
+    inference_workers._check_supported()  # does not raise
+
+
+def test_profile_tuned_for_other_process_count_is_ignored(profile, monkeypatch):
+    monkeypatch.setattr(cfg, "INFERENCE_PROCESSES", 2)
+    profile(SETTINGS, inference_processes=0)
+    assert cfg.apply_deployment_profile() == {}
+    assert cfg.INFERENCE_COMPILE == "none"
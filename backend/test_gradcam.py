@@ -0,0 +1,37 @@
+import pytest
+import torch
+
+from models.efficientnet import build_efficientnet
+from backend.gradCam import closed_form_cam, forward_with_features, get_gradcam_engine, get_linear_head
+
+
+@pytest.fixture(scope="module")
+def model():
+    torch.manual_seed(0)
+    return build_efficientnet(pretrained=False).eval()
+
+
+@pytest.mark.parametrize("param_index", [0, 7, 12])
+def test_closed_form_cam_matches_gradcam(model, param_index):
+    torch.manual_seed(param_index)
+    x = torch.randn(1, 3, 224, 224)
+
+    expected = get_gradcam_engine(model).generate(x, param_index)
+    with torch.no_grad():
+        _, feats = forward_with_features(model, x)
+    assert feats is not None
+    assert expected.max() > 0  # a non-trivial map, not two all-zero CAMs
+
+    torch.testing.assert_close(closed_form_cam(model, feats, param_index), expected, atol=1e-5, rtol=1e-4)
+    # the Linear head alone is what ONNX serving keeps (model_registry.health_head())
+    torch.testing.assert_close(closed_form_cam(get_linear_head(model), feats, param_index), expected, atol=1e-5, rtol=1e-4)
+
+
+def test_cams_leave_no_parameter_gradients(model):
+    x = torch.randn(1, 3, 224, 224)
+    get_gradcam_engine(model).generate(x, 0)
+    with torch.no_grad():
+        _, feats = forward_with_features(model, x)
+    closed_form_cam(model, feats, 0)
+
+    assert all(p.grad is None for p in model.parameters())
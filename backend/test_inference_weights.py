@@ -0,0 +1,70 @@
+import os
+
+import torch
+import torch.nn as nn
+
+from core.utils import (
+    save_inference_weights,
+    load_inference_weights,
+    load_state_for_inference,
+    instantiate_with_state,
+    inference_weights_path,
+    resolve_weights_path,
+)
+
+
+def _build():
+    return nn.Sequential(nn.Conv2d(3, 4, 3), nn.BatchNorm2d(4), nn.Flatten(), nn.Linear(4 * 6 * 6, 2))
+
+
+def _trained():
+    torch.manual_seed(0)
+    model = _build().eval()
+    model[1].running_mean.normal_()  # non-default buffers must round-trip too
+    return model
+
+
+def test_round_trip_into_meta_model(tmp_path):
+    model = _trained()
+    path = str(tmp_path / "m.safetensors")
+    save_inference_weights(model.state_dict(), path, metadata={"epoch": 3})
+
+    state = load_inference_weights(path)
+    assert set(state) == set(model.state_dict())
+    for name, t in model.state_dict().items():
+        assert state[name].dtype == t.dtype
+        assert torch.equal(state[name], t)
+
+    loaded = instantiate_with_state(_build, state).eval()
+    assert not any(t.is_meta for t in list(loaded.parameters()) + list(loaded.buffers()))
+    x = torch.randn(2, 3, 8, 8)
+    with torch.no_grad():
+        assert torch.equal(loaded(x), model(x))
+
+
+def test_half_storage_loads_as_float32(tmp_path):
+    model = _trained()
+    path = str(tmp_path / "m.safetensors")
+    save_inference_weights(model.state_dict(), path, half=True)
+
+    state = load_inference_weights(path)
+    weight = model.state_dict()["3.weight"]
+    assert state["3.weight"].dtype == torch.float32
+    assert torch.allclose(state["3.weight"], weight, atol=1e-3)
+    assert state["1.num_batches_tracked"].dtype == torch.int64  # integer buffers stay exact
+
+
+def test_slim_export_preferred_only_when_current(tmp_path):
+    model = _trained()
+    ckpt = str(tmp_path / "m_best.pth")
+    torch.save({"epoch": 1, "model_state": model.state_dict()}, ckpt)
+    assert resolve_weights_path(ckpt) == ckpt
+
+    slim = inference_weights_path(ckpt)
+    save_inference_weights(model.state_dict(), slim)
+    assert resolve_weights_path(ckpt) == slim
+    assert torch.equal(load_state_for_inference(ckpt)["3.weight"], model.state_dict()["3.weight"])
+
+    torch.save({"epoch": 2, "model_state": model.state_dict()}, ckpt)
+    os.utime(ckpt, (os.path.getmtime(slim) + 10,) * 2)  # checkpoint retrained after the export
+    assert resolve_weights_path(ckpt) == ckpt
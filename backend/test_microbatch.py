@@ -0,0 +1,72 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import torch
+
+from core import config as cfg
+from backend.batching import MicroBatcher
+from backend.model_registry import ModelRegistry
+
+
+class RecordingForward:
+    """forward(batch) -> (2 * batch, None), remembering the size of every merged batch."""
+
+    def __init__(self):
+        self.sizes = []
+        self._lock = threading.Lock()
+
+    def __call__(self, batch):
+        with self._lock:
+            self.sizes.append(batch.size(0))
+        return batch * 2, None
+
+
+@pytest.fixture
+def forward():
+    return RecordingForward()
+
+
+def test_each_caller_gets_its_own_rows(forward):
+    batcher = MicroBatcher(forward, max_batch_size=8, max_wait_ms=50)
+    # distinct values and 1-3 rows per caller, so a misrouted slice can't pass
+    inputs = [torch.full((1 + i % 3, 4), float(i)) for i in range(12)]
+    try:
+        with ThreadPoolExecutor(max_workers=len(inputs)) as pool:
+            results = list(pool.map(batcher, inputs))
+    finally:
+        batcher.stop()
+
+    for x, (out, feats) in zip(inputs, results):
+        torch.testing.assert_close(out, x * 2)
+        assert feats is None
+    assert sum(forward.sizes) == sum(x.size(0) for x in inputs)
+    assert max(forward.sizes) <= 8
+    assert len(forward.sizes) < len(inputs)  # requests were actually merged
+
+
+def test_forward_errors_reach_every_caller_in_the_batch():
+    def failing(batch):
+        raise RuntimeError("boom")
+
+    batcher = MicroBatcher(failing, max_batch_size=8, max_wait_ms=50)
+    try:
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            futures = [pool.submit(batcher, torch.zeros(1, 4)) for _ in range(3)]
+            for future in futures:
+                with pytest.raises(RuntimeError, match="boom"):
+                    future.result()
+    finally:
+        batcher.stop()
+
+
+@pytest.mark.parametrize("workers, batched", [(1, False), (4, True)])
+def test_registry_micro_batches_only_with_several_inference_workers(monkeypatch, forward, workers, batched):
+    monkeypatch.setattr(cfg, "MICROBATCH_WAIT_MS", 5)
+    monkeypatch.setattr(cfg, "INFERENCE_WORKERS", workers)
+    registry = ModelRegistry()
+    fn = registry._get_forward("health", object(), forward)
+    try:
+        assert isinstance(fn, MicroBatcher) is batched
+    finally:
+        registry.clear()
@@ -0,0 +1,62 @@
+import torch
+
+from core import config as cfg
+from backend.prediction_cache import PredictionCache, content_hash
+from backend.model_registry import ModelRegistry
+
+
+def test_lru_evicts_least_recently_used():
+    cache = PredictionCache(max_entries=2)
+    cache.put("a", {"v": 1})
+    cache.put("b", {"v": 2})
+    assert cache.get("a") == {"v": 1}  # "a" is now the most recent
+    cache.put("c", {"v": 3})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": 1}
+    assert cache.get("c") == {"v": 3}
+    assert cache.stats()["entries"] == 2
+
+
+def test_entries_are_deep_copies():
+    cache = PredictionCache(max_entries=4)
+    entry = {"outputs": [1.0, 2.0], "gradcam_url": None}
+    cache.put("k", entry)
+    entry["outputs"].append(3.0)  # caller keeps mutating what it stored
+
+    got = cache.get("k")
+    assert got["outputs"] == [1.0, 2.0]
+    got["outputs"].clear()  # and what it got back
+    assert cache.get("k")["outputs"] == [1.0, 2.0]
+
+
+def test_disabled_cache_stores_nothing():
+    cache = PredictionCache(max_entries=0)
+    cache.put("k", {"v": 1})
+    assert cache.get("k") is None
+
+
+def test_disk_entries_survive_a_new_instance(tmp_path):
+    PredictionCache(max_entries=4, cache_dir=str(tmp_path)).put("k", {"v": 1})
+    assert PredictionCache(max_entries=4, cache_dir=str(tmp_path)).get("k") == {"v": 1}
+
+
+def test_key_depends_on_checkpoint_digest_and_decode_size(monkeypatch):
+    image_hash = content_hash(b"jpeg bytes")
+    monkeypatch.setattr(cfg, "DECODE_MIN_SIZE", 0)
+    key = PredictionCache.prediction_key(image_hash, "digest-a")
+
+    assert PredictionCache.prediction_key(image_hash, "digest-b") != key
+    monkeypatch.setattr(cfg, "DECODE_MIN_SIZE", 512)
+    assert PredictionCache.prediction_key(image_hash, "digest-a") != key
+    assert PredictionCache.features_key(image_hash) != PredictionCache.features_key(content_hash(b"other"))
+
+
+def test_checkpoint_digest_changes_with_the_weights(tmp_path, monkeypatch):
+    monkeypatch.setattr(cfg, "CHECKPOINT_DIR", str(tmp_path))
+    registry = ModelRegistry()
+    torch.save({"model_state": {"w": torch.zeros(3)}}, registry.health_ckpt)
+    before = registry.checkpoint_digest
+
+    torch.save({"model_state": {"w": torch.ones(3)}}, registry.health_ckpt)
+    assert ModelRegistry().checkpoint_digest != before
@@ -0,0 +1,98 @@
+import hashlib
+import os
+
+import pytest
+
+from core import config as cfg
+from backend.startup import LocalMirrorSource, Readiness, download_file, download_models, write_manifest, MODELS
+
+
+def _mirror(tmp_path, files):
+    mirror = tmp_path / "mirror"
+    mirror.mkdir()
+    for name, data in files.items():
+        (mirror / name).write_bytes(data)
+    return mirror
+
+
+def _entry(data):
+    return {"size": len(data), "sha256": hashlib.sha256(data).hexdigest()}
+
+
+def _leftovers(dest):
+    return [n for n in os.listdir(dest) if n.endswith(".part")]
+
+
+def test_verified_download(tmp_path):
+    data = b"weights" * 1000
+    source = LocalMirrorSource(str(_mirror(tmp_path, {"m.pth": data})))
+    dest = tmp_path / "dest"
+    dest.mkdir()
+
+    path = download_file(source, "m.pth", str(dest), _entry(data))
+    assert open(path, "rb").read() == data
+    assert _leftovers(dest) == []
+
+
+@pytest.mark.parametrize("entry", [
+    {"size": 5, "sha256": hashlib.sha256(b"weights").hexdigest()},  # wrong size
+    {"size": 7, "sha256": "0" * 64},                                  # wrong sha256
+])
+def test_mismatch_is_rejected_and_not_promoted(tmp_path, entry):
+    source = LocalMirrorSource(str(_mirror(tmp_path, {"m.pth": b"weights"})))
+    dest = tmp_path / "dest"
+    dest.mkdir()
+
+    with pytest.raises(IOError, match="checksum mismatch"):
+        download_file(source, "m.pth", str(dest), entry)
+    assert not (dest / "m.pth").exists()
+    assert _leftovers(dest) == []
+
+
+def test_failed_download_keeps_the_previous_file(tmp_path):
+    source = LocalMirrorSource(str(_mirror(tmp_path, {"m.pth": b"new weights"})))
+    dest = tmp_path / "dest"
+    dest.mkdir()
+    (dest / "m.pth").write_bytes(b"old weights")
+
+    with pytest.raises(IOError):
+        download_file(source, "m.pth", str(dest), {"size": 1, "sha256": "0" * 64})
+    assert (dest / "m.pth").read_bytes() == b"old weights"
+    assert _leftovers(dest) == []
+
+
+def test_download_models_replaces_a_corrupt_local_copy(tmp_path):
+    files = {name: name.encode() * 100 for name in MODELS}
+    mirror = _mirror(tmp_path, files)
+    write_manifest(str(mirror))
+    dest = tmp_path / "dest"
+    dest.mkdir()
+    (dest / MODELS[0]).write_bytes(b"truncated")
+
+    download_models(LocalMirrorSource(str(mirror)), str(dest))
+    for name, data in files.items():
+        assert (dest / name).read_bytes() == data
+    assert _leftovers(dest) == []
+
+
+def test_readiness_retries_a_failed_load(monkeypatch):
+    monkeypatch.setattr(cfg, "MODEL_LOAD_RETRY_S", 0.01)
+    monkeypatch.setattr("backend.startup.download_models", lambda: None)
+    results = iter([False, False, True])  # e.g. the checkpoint arrives on the third attempt
+
+    readiness = Readiness()
+    readiness.start(lambda: next(results)).join(timeout=5)
+    state = readiness.snapshot()
+    assert state["ready"] and state["status"] == "ready"
+    assert state["attempt"] == 3 and state["error"] is None
+
+
+def test_readiness_without_retry_stays_failed(monkeypatch):
+    monkeypatch.setattr(cfg, "MODEL_LOAD_RETRY_S", 0)
+    monkeypatch.setattr("backend.startup.download_models", lambda: None)
+
+    readiness = Readiness()
+    readiness.start(lambda: False).join(timeout=5)
+    state = readiness.snapshot()
+    assert not state["ready"] and state["status"] == "failed"
+    assert state["attempt"] == 1
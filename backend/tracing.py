@@ -0,0 +1,192 @@
+# backend/tracing.py
+"""
+Opt-in per-request profiling (cfg.REQUEST_PROFILING=1 on the server, then per request):
+
+    curl -H "X-Profile: 1" -F ... /predict          (or /predict?profile=1)
+
+The request runs with a wall-clock span tracer (evaluate_transformer,
+extract_image_features, verify_transformer_images, adaptive_layer.adjust, ...) and,
+when PyTorch is loaded, under torch.profiler. Both are merged into one Chrome-trace
+JSON under cfg.TRACE_DIR (open it in chrome://tracing or https://ui.perfetto.dev);
+the response's X-Profile-Trace header names the file, GET /traces/{name} returns it.
+
+Profiled /predict requests run in the API process and skip micro-batching, so all
+of their torch ops land in the profiled thread. One torch.profiler session runs at
+a time; a concurrent profiled request only gets the wall-clock spans.
+"""
+
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+HEADER = "X-Profile"
+RESULT_HEADER = "X-Profile-Trace"
+
+_current = ContextVar("request_trace", default=None)
+_torch_profiler_lock = threading.Lock()  # torch.profiler is process-global
+
+
+class RequestTrace:
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.started_ns = time.time_ns()
+        self.torch_trace = None  # path of torch.profiler's chrome trace, if any
+        self.torch_skipped = None
+        self._lock = threading.Lock()
+        self._spans = []
+
+    @contextmanager
+    def span(self, name):
+        start = time.time_ns()
+        try:
+            # also a torch.profiler annotation (no-op while it isn't recording)
+            with _record_function(name):
+                yield
+        finally:
+            end = time.time_ns()
+            thread = threading.current_thread()
+            with self._lock:
+                self._spans.append((name, start, end, thread.ident, thread.name))
+
+    def chrome_events(self, base_ns=0):
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self._spans)
+        events = [{
+            "name": name, "cat": "span", "ph": "X", "pid": pid, "tid": tid,
+            "ts": (start - base_ns) / 1000, "dur": (end - start) / 1000,
+        } for name, start, end, tid, _ in spans]
+        threads = {tid: thread_name for _, _, _, tid, thread_name in spans}
+        events += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread_name}}
+                   for tid, thread_name in threads.items()]
+        return events
+
+    def save(self, trace_dir):
+        """Write the merged Chrome trace; returns its file name."""
+        trace = {"traceEvents": [], "displayTimeUnit": "ms"}
+        base_ns = 0
+        if self.torch_trace is not None:
+            with open(self.torch_trace, "r") as f:
+                trace = json.load(f)
+            os.remove(self.torch_trace)
+            # torch.profiler timestamps are wall-clock µs relative to baseTimeNanoseconds
+            base_ns = trace.get("baseTimeNanoseconds", 0)
+        trace["traceEvents"].extend(self.chrome_events(base_ns))
+        trace["traceName"] = f"{self.endpoint} {self.trace_id}"
+        trace["otherData"] = {"endpoint": self.endpoint, "torchProfilerSkipped": self.torch_skipped}
+
+        os.makedirs(trace_dir, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started_ns / 1e9))}-{self.endpoint}-{self.trace_id}.json"
+        tmp = os.path.join(trace_dir, f"{name}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(trace, f)
+        os.replace(tmp, os.path.join(trace_dir, name))
+        return name
+
+
+def _record_function(name):
+    torch = sys.modules.get("torch")  # never import torch just for an annotation
+    return torch.profiler.record_function(name) if torch is not None else nullcontext()
+
+
+# -------------------------
+# Instrumentation (no-ops outside a profiled request)
+# -------------------------
+def active() -> bool:
+    return _current.get() is not None
+
+
+def span(name):
+    trace = _current.get()
+    return trace.span(name) if trace is not None else nullcontext()
+
+
+def traced(name=None):
+    """Decorator: record each call as a span while a profiled request is running."""
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            trace = _current.get()
+            if trace is None:
+                return fn(*args, **kwargs)
+            with trace.span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# -------------------------
+# Request entry points (backend/api/main.py)
+# -------------------------
+def requested(request) -> bool:
+    """cfg.REQUEST_PROFILING and an X-Profile: 1 header or ?profile=1 on request."""
+    from core import config as cfg
+
+    if not cfg.REQUEST_PROFILING:
+        return False
+    flag = request.headers.get(HEADER) or request.query_params.get("profile") or ""
+    return flag.lower() in ("1", "true", "yes")
+
+
+@contextmanager
+def profile_request(endpoint, response):
+    """
+    Trace the with-block (the endpoint body, and the executor work it awaits: the
+    context is copied into backend.executors' pools) and save it under cfg.TRACE_DIR.
+    """
+    from core import config as cfg
+
+    trace = RequestTrace(endpoint)
+    token = _current.set(trace)
+    try:
+        with trace.span(endpoint):
+            yield trace
+    finally:
+        _current.reset(token)
+        try:
+            response.headers[RESULT_HEADER] = trace.save(cfg.TRACE_DIR)
+        except Exception as e:
+            print(f"⚠️ Could not save profiling trace: {e}")
+
+
+def with_torch_profiler(fn):
+    """
+    fn wrapped to run under torch.profiler (CPU activities, shapes, memory) in the
+    thread that calls it; the profile is attached to the current request's trace.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        trace = _current.get()
+        if trace is None:
+            return fn(*args, **kwargs)
+        if "torch" not in sys.modules or not _torch_profiler_lock.acquire(blocking=False):
+            trace.torch_skipped = "busy" if "torch" in sys.modules else "torch not loaded"
+            return fn(*args, **kwargs)
+
+        import tempfile
+        from torch.profiler import profile, ProfilerActivity
+
+        try:
+            with profile(activities=[ProfilerActivity.CPU], record_shapes=True, profile_memory=True) as prof:
+                result = fn(*args, **kwargs)
+            fd, path = tempfile.mkstemp(prefix="torch-trace-", suffix=".json")
+            os.close(fd)
+            prof.export_chrome_trace(path)
+            trace.torch_trace = path
+        finally:
+            _torch_profiler_lock.release()
+        return result
+    return wrapper
@@ -19,22 +19,23 @@ from core.dataset import TransformerHealthDataset
 from core.dataset import PMTClassifierDataset
 
 from core.augment import build_transforms
-from core.utils import set_seed, get_device, save_checkpoint
+from core.utils import set_seed, get_device, save_checkpoint, autocast
 
 from models.custom_cnn import CustomCNN
 from models.resnet import build_resnet
 from models.efficientnet import build_efficientnet
 
 from models.pmt_classifier import build_pmt_classifier
+from backend.model_optimization import compile_for_training
 
 
 
 # -----------------------------------------------------------
 # Build Model
 # -----------------------------------------------------------
-def build_model(model_name):
-    
-    pretrained = cfg.PRETRAINED
+def build_model(model_name, pretrained=None):
+    """pretrained=None uses cfg.PRETRAINED; False skips the ImageNet download/init."""
+    pretrained = cfg.PRETRAINED if pretrained is None else pretrained
     dropout = cfg.DROPOUT
 
     
@@ -46,7 +47,7 @@ def build_model(model_name):
         elif "resnet" in model_name:
             model = build_resnet(model_name, pretrained, dropout)
         elif "efficientnet" in model_name:
-            model = build_efficientnet(model_name)
+            model = build_efficientnet(model_name, pretrained=pretrained)
     
 
         if cfg.FREEZE_BACKBONE and model_name != "custom_cnn":
@@ -65,7 +66,7 @@ def build_model(model_name):
 
     elif model_name == "pmt_classifier":
         
-        return build_pmt_classifier()
+        return build_pmt_classifier(pretrained=pretrained)
     
     else:
         raise ValueError(f"Unknown model: {model_name}")
@@ -112,8 +113,9 @@ def train_one_epoch_regression(model, loader, criterion, optimizer, device):
         targets = targets.to(device)  # [B,13]
 
         optimizer.zero_grad()
-        outputs = model(imgs)         # [B,13]
-        loss = criterion(outputs, targets)
+        with autocast(device):        # bf16 forward if cfg.MIXED_PRECISION
+            outputs = model(imgs)     # [B,13]
+        loss = criterion(outputs.float(), targets)  # loss in float32
         loss.backward()
         optimizer.step()
 
@@ -132,8 +134,9 @@ def train_one_epoch_classifier(model, loader, criterion, optimizer, device):
     for imgs, labels in tqdm(loader, desc="Train", leave=False):
         imgs, labels = imgs.to(device), labels.to(device)
         optimizer.zero_grad()
-        outputs = model(imgs)
-        loss = criterion(outputs, labels)
+        with autocast(device):
+            outputs = model(imgs)
+        loss = criterion(outputs.float(), labels)
         loss.backward()
         optimizer.step()
         total_loss += loss.item() * imgs.size(0)
@@ -157,7 +160,9 @@ def evaluate_regression(model, loader, criterion, device):
             imgs = imgs.to(device)
             targets = targets.to(device)
 
-            outputs = model(imgs)  # [B,13]
+            with autocast(device):
+                outputs = model(imgs)  # [B,13]
+            outputs = outputs.float()  # metrics in float32
             loss = criterion(outputs, targets)
 
             losses.append(loss.item() * imgs.size(0))
@@ -180,7 +185,9 @@ def evaluate_classifier(model, loader, criterion, device):
     with torch.no_grad():
         for imgs, labels in tqdm(loader, desc="Val", leave=False):
             imgs, labels = imgs.to(device), labels.to(device)
-            outputs = model(imgs)
+            with autocast(device):
+                outputs = model(imgs)
+            outputs = outputs.float()
             loss = criterion(outputs, labels)
             preds = torch.argmax(outputs, dim=1)
             all_labels.extend(labels.cpu().numpy())
@@ -205,11 +212,13 @@ def main():
 
     parser = argparse.ArgumentParser()
     parser.add_argument("--model", type=str, default=None, help="Choose model to train: 'regression' or 'classifier'")
+    parser.add_argument("--compile", action="store_true", default=cfg.TRAIN_COMPILE, help="torch.compile the model for training (default: cfg.TRAIN_COMPILE)")
     args = parser.parse_args()
 
 
 
 
+    cfg.ensure_dirs()
     set_seed(cfg.SEED)
     device = get_device()
 
@@ -248,6 +257,8 @@ def main():
 
     
     model = build_model(model_name).to(device)
+    # compiled wrapper for the train/eval passes; checkpoints are saved from model itself
+    run_model = compile_for_training(model) if args.compile else model
     
     optimizer = get_optimizer(model.parameters())
     
@@ -264,14 +275,14 @@ def main():
 
        
         if model_name == "pmt_classifier":
-            tr_loss = train_one_epoch_classifier(model, train_loader, criterion, optimizer, device)
-            acc, prec, rec, f1, cm = evaluate_classifier(model, val_loader, criterion, device)
+            tr_loss = train_one_epoch_classifier(run_model, train_loader, criterion, optimizer, device)
+            acc, prec, rec, f1, cm = evaluate_classifier(run_model, val_loader, criterion, device)
             current_metric = f1
             print(f"Train Loss: {tr_loss:.4f} | Val F1: {f1:.4f} | Acc: {acc:.4f}")
        
         else:
-            tr_loss = train_one_epoch_regression(model, train_loader, criterion, optimizer, device)
-            val_loss, val_mae = evaluate_regression(model, val_loader, criterion, device)
+            tr_loss = train_one_epoch_regression(run_model, train_loader, criterion, optimizer, device)
+            val_loss, val_mae = evaluate_regression(run_model, val_loader, criterion, device)
             current_metric = val_mae
             print(f"Train Loss: {tr_loss:.4f} | Val Loss: {val_loss:.4f} | MAE(0–6): {val_mae:.2f}")
 
@@ -1,23 +1,38 @@
 import os
 import sys
-import argparse
 
 # ========= Base (project root) =========
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# Importing this module has no side effects (no argument parsing, printing or directory
+# creation): the API imports it too. Scripts that write outputs call ensure_dirs().
 
 
 # ========= User-selectable model type =========
-parser = argparse.ArgumentParser(description="Select target model")
-parser.add_argument(
-    "--model",
-    choices=["regression", "classifier"],
-    default="regression",
-    help="Target model: 'regression' (Health Index) or 'classifier' (PMT vs Non-PMT)"
-)
-args, unknown = parser.parse_known_args()
-TARGET_MODEL = args.model
-print(f"ℹ Using TARGET_MODEL = {TARGET_MODEL}")
+def _target_model():
+    """
+    A "--model regression|classifier" script argument, else the TARGET_MODEL env var,
+    else "regression". "--model all" (the export scripts' both-models choice) selects
+    nothing here; any other value raises instead of silently training the wrong head.
+    """
+    target = None
+    argv = sys.argv[1:]
+    for i, arg in enumerate(argv):
+        if arg == "--model" and i + 1 < len(argv):
+            target = argv[i + 1]
+        elif arg.startswith("--model="):
+            target = arg.split("=", 1)[1]
+    if target == "all":
+        target = None
+    source = "--model"
+    if target is None:
+        target, source = os.environ.get("TARGET_MODEL") or "regression", "TARGET_MODEL"
+    if target not in ("regression", "classifier"):
+        raise ValueError(f"Unknown {source} {target!r}: expected 'regression' or 'classifier'")
+    return target
+
+
+TARGET_MODEL = _target_model()
 
 
 
@@ -57,14 +72,16 @@ METRICS_DIR    = os.path.join(OUTPUT_ROOT, "metrics")
 GRADCAM_DIR    = os.path.join(OUTPUT_ROOT, "gradcam")
 
 
-dirs_to_create = [PROCESSED_DIR, CHECKPOINT_DIR, LOG_DIR, METRICS_DIR, GRADCAM_DIR]
-
-if TARGET_MODEL == "classifier":                                                  # only create classifier folders when classifier model used 
-    dirs_to_create += [CLASSIFIER_PROCESSED_DIR, CLASSIFIER_TRAIN_DIR, CLASSIFIER_VAL_DIR, CLASSIFIER_TEST_DIR]
+def ensure_dirs():
+    """Create the data/output folders (called by the training / evaluation scripts)."""
+    dirs_to_create = [PROCESSED_DIR, CHECKPOINT_DIR, LOG_DIR, METRICS_DIR, GRADCAM_DIR]
 
+    if TARGET_MODEL == "classifier":                                              # only create classifier folders when classifier model used
+        dirs_to_create += [CLASSIFIER_PROCESSED_DIR, CLASSIFIER_TRAIN_DIR, CLASSIFIER_VAL_DIR, CLASSIFIER_TEST_DIR]
 
-for d in dirs_to_create:
-    os.makedirs(d, exist_ok=True)
+    for d in dirs_to_create:
+        os.makedirs(d, exist_ok=True)
+    print(f"ℹ Using TARGET_MODEL = {TARGET_MODEL}")
 
 
 # ========= Model & Training =========
@@ -82,7 +99,138 @@ OPTIMIZER = "adam"
 WEIGHT_DECAY = 0.0001
 EARLY_STOPPING_PATIENCE = 10
 SCHEDULER = "cosine"
-MIXED_PRECISION = False   # CPU ONLY → must be False
+# bfloat16 autocast for training, evaluation and API inference (losses/metrics stay float32).
+# Only faster on CPUs with AVX512-BF16/AMX (or bf16-capable GPUs); elsewhere leave it off.
+MIXED_PRECISION = os.environ.get("MIXED_PRECISION", "0") == "1"
+
+# Inference (API)
+INFERENCE_BATCH_SIZE = int(os.environ.get("INFERENCE_BATCH_SIZE", 32))   # max images per forward pass in /predict
+
+# Blocking API work runs on bounded pools so the event loop keeps accepting requests
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", 1))    # concurrent evaluate_transformer calls
+FEATURE_WORKERS = int(os.environ.get("FEATURE_WORKERS", 4))        # OpenCV decode / features / hashes
+TORCH_NUM_THREADS = int(os.environ.get("TORCH_NUM_THREADS", 0)) or None   # torch intra-op threads (None = torch default)
+CV2_NUM_THREADS = int(os.environ["CV2_NUM_THREADS"]) if "CV2_NUM_THREADS" in os.environ else None
+
+# Inference backend for the batched forwards: "torch" or "onnx" (onnxruntime on CPU,
+# needs backend/onnx_backend.py exports; falls back to torch if they are missing/stale)
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "torch")
+ONNX_ATOL = float(os.environ.get("ONNX_ATOL", 1e-4))   # export check: max |ORT - PyTorch| on raw outputs
+
+# PyTorch graph optimizations for inference (backend/model_optimization.py):
+# "none", "freeze" (TorchScript freeze, Conv-BN folding) or "compile" (torch.compile/Inductor).
+# Frozen graphs / Inductor caches are kept in COMPILE_CACHE_DIR, keyed by checkpoint digest.
+INFERENCE_COMPILE = os.environ.get("INFERENCE_COMPILE", "none")
+COMPILE_CACHE_DIR = os.environ.get("COMPILE_CACHE_DIR", os.path.join(OUTPUT_ROOT, "compile_cache"))
+TRAIN_COMPILE = os.environ.get("TRAIN_COMPILE", "0") == "1"   # backend/train.py default for --compile
+
+# INT8 ONNX models (backend/quantization.py); only served if their test-set report passes these limits
+ONNX_INT8 = os.environ.get("ONNX_INT8", "0") == "1"
+QUANT_CALIBRATION_SAMPLES = int(os.environ.get("QUANT_CALIBRATION_SAMPLES", 128))
+QUANT_MAX_MAE_INCREASE = float(os.environ.get("QUANT_MAX_MAE_INCREASE", 0.05))  # overall MAE, 0-6 scale
+QUANT_MAX_F1_DROP = float(os.environ.get("QUANT_MAX_F1_DROP", 0.01))            # PMT F1
+
+# Multi-process serving: N forked inference processes share one copy of the weights
+# (Grad-CAM then always runs inline). 0 = inference in the API process's thread pool.
+INFERENCE_PROCESSES = int(os.environ.get("INFERENCE_PROCESSES", 0))
+
+# /submit-corrections history (adjustments.json) and global learned offsets (learned_adjustments.json)
+ADJUSTMENTS_DIR = os.environ.get("ADJUSTMENTS_DIR", os.path.join(ROOT_DIR, "backend", "api"))
+
+# Opt-in per-request profiling (backend/tracing.py): with 1, an "X-Profile: 1" header or
+# ?profile=1 on /predict or /verify-transformer saves a Chrome trace under TRACE_DIR
+REQUEST_PROFILING = os.environ.get("REQUEST_PROFILING", "0") == "1"
+TRACE_DIR = os.environ.get("TRACE_DIR", os.path.join(LOG_DIR, "traces"))
+
+# 0 = feature-only API worker (/extract-hashes, /verify-transformer): the models are never
+# downloaded or loaded, torch is never imported, and /predict answers 503
+SERVE_MODELS = os.environ.get("SERVE_MODELS", "1") == "1"
+
+# Model download at startup (backend/startup.py): Supabase bucket, or a local directory
+# mirror with the same layout (manifest.json + checkpoints) for offline runs
+MODEL_BUCKET = os.environ.get("MODEL_BUCKET", "models")
+MODEL_MIRROR_DIR = os.environ.get("MODEL_MIRROR_DIR", "")
+MODEL_DOWNLOAD_WORKERS = int(os.environ.get("MODEL_DOWNLOAD_WORKERS", 4))
+# A failed download + load is retried after MODEL_LOAD_RETRY_S seconds, doubling per
+# failure up to MODEL_LOAD_RETRY_MAX_S. 0 = no retry (GET /ready stays "failed").
+MODEL_LOAD_RETRY_S = float(os.environ.get("MODEL_LOAD_RETRY_S", 5))
+MODEL_LOAD_RETRY_MAX_S = float(os.environ.get("MODEL_LOAD_RETRY_MAX_S", 300))
+
+# Micro-batching across concurrent /predict requests: images arriving within
+# MICROBATCH_WAIT_MS share one forward pass. 0 = disabled. Only enabled with
+# INFERENCE_WORKERS > 1: a single worker never has two requests to merge.
+MICROBATCH_WAIT_MS = float(os.environ.get("MICROBATCH_WAIT_MS", 0))
+MICROBATCH_MAX_SIZE = int(os.environ.get("MICROBATCH_MAX_SIZE", 32))
+
+# Grad-CAM background jobs: /predict returns job ids, overlays polled via /gradcam/{job_id}
+GRADCAM_ASYNC = os.environ.get("GRADCAM_ASYNC", "0") == "1"
+GRADCAM_WORKERS = int(os.environ.get("GRADCAM_WORKERS", 2))
+GRADCAM_MAX_PENDING = int(os.environ.get("GRADCAM_MAX_PENDING", 64))     # /predict blocks when this many are queued
+GRADCAM_JOB_RETENTION = int(os.environ.get("GRADCAM_JOB_RETENTION", 1000))  # finished jobs kept for polling
+
+# Grad-CAM overlay storage: "supabase" (bucket), "local" (GRADCAM_DIR, served at /outputs) or "memory" (tests)
+ARTIFACT_STORAGE = os.environ.get("ARTIFACT_STORAGE", "supabase")
+STORAGE_UPLOAD_WORKERS = int(os.environ.get("STORAGE_UPLOAD_WORKERS", 8))
+PUBLIC_BASE_URL = os.environ.get("PUBLIC_BASE_URL", "http://localhost:8000")   # used by the "local" backend
+
+# Content-hash prediction cache: repeated uploads skip the models (0 = disabled).
+# PREDICTION_CACHE_DIR additionally keeps entries on disk, one small JSON file each (not pruned).
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", 1024))
+PREDICTION_CACHE_DIR = os.environ.get("PREDICTION_CACHE_DIR", "")
+
+# Host-tuned inference settings written by backend/autotune.py and applied by the API at
+# startup (apply_deployment_profile). Explicit environment variables win; "" = ignore.
+DEPLOYMENT_PROFILE = os.environ.get("DEPLOYMENT_PROFILE", os.path.join(OUTPUT_ROOT, "deployment_profile.json"))
+PROFILE_SETTINGS = (
+    "TORCH_NUM_THREADS", "CV2_NUM_THREADS", "INFERENCE_BACKEND", "INFERENCE_COMPILE",
+    "INFERENCE_BATCH_SIZE", "MICROBATCH_MAX_SIZE",
+)
+
+
+def apply_deployment_profile():
+    """
+    Override this module's PROFILE_SETTINGS from DEPLOYMENT_PROFILE (those not set in the
+    environment). Skipped when the profile was tuned for another model, CPU count or
+    INFERENCE_PROCESSES. With INFERENCE_PROCESSES > 0 a non-torch backend / compile mode
+    in it is skipped too: forked workers only share the eager PyTorch path.
+    Returns the applied {setting: value}.
+    """
+    import json
+
+    if not DEPLOYMENT_PROFILE or not os.path.exists(DEPLOYMENT_PROFILE):
+        return {}
+    try:
+        with open(DEPLOYMENT_PROFILE, "r") as f:
+            profile = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not read deployment profile {DEPLOYMENT_PROFILE}: {e}")
+        return {}
+
+    if profile.get("model") != MODEL_NAME:
+        print(f"⚠️ Deployment profile {DEPLOYMENT_PROFILE} was tuned for {profile.get('model')}, not {MODEL_NAME}. Ignored.")
+        return {}
+    tuned_cpus = profile.get("host", {}).get("cpu_count")
+    if tuned_cpus != os.cpu_count():
+        print(f"⚠️ Deployment profile {DEPLOYMENT_PROFILE} was tuned on {tuned_cpus} CPUs, this host has {os.cpu_count()}. Ignored.")
+        return {}
+    tuned_processes = profile.get("inference_processes")
+    if tuned_processes is not None and tuned_processes != INFERENCE_PROCESSES:
+        print(f"⚠️ Deployment profile {DEPLOYMENT_PROFILE} was tuned for INFERENCE_PROCESSES={tuned_processes}, "
+              f"this server runs {INFERENCE_PROCESSES}. Ignored.")
+        return {}
+
+    module = sys.modules[__name__]
+    applied = {}
+    for name, value in profile.get("settings", {}).items():
+        if name not in PROFILE_SETTINGS or name in os.environ:
+            continue
+        if INFERENCE_PROCESSES > 0 and name in ("INFERENCE_BACKEND", "INFERENCE_COMPILE") and value not in ("torch", "none"):
+            print(f"⚠️ Deployment profile: skipping {name}={value} (INFERENCE_PROCESSES > 0 serves eager PyTorch only)")
+            continue
+        setattr(module, name, value)
+        applied[name] = value
+    print(f"⚙️ Deployment profile {DEPLOYMENT_PROFILE}: {applied}")
+    return applied
 
 FREEZE_BACKBONE = False
 DROPOUT = 0.3
@@ -146,3 +294,10 @@ FRONTEND_URL = os.environ.get("FRONTEND_URL", "http://localhost:3000")
 
 CHECKPOINT_PATH = os.path.join(CHECKPOINT_DIR, f"{MODEL_NAME}_best.pth")
 
+# Reduced-resolution JPEG decoding for the API: large uploads are decoded at the smallest
+# DCT scale (1/2, 1/4, 1/8) whose sides still cover this many pixels. Use >= max(IMAGE_SIZE, 256)
+# (model input and feature size); higher values keep sharper Grad-CAM overlays.
+# 0 = full-resolution decode (default): reduced decoding slightly changes imageHash, and the
+# frontend's duplicate check matches hashes exactly against ones stored from full decodes.
+DECODE_MIN_SIZE = int(os.environ.get("DECODE_MIN_SIZE", 0))
+
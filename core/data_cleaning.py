@@ -161,4 +161,5 @@ def clean_and_split(test_size: float = 0.15, val_size: float = 0.15, seed: int =
 
 
 if __name__ == "__main__":
+    cfg.ensure_dirs()
     clean_and_split()
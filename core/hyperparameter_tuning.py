@@ -57,4 +57,5 @@ def run_tuning():
 
 
 if __name__ == "__main__":
+    cfg.ensure_dirs()
     run_tuning()
@@ -4,7 +4,10 @@ ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if ROOT_DIR not in sys.path:
     sys.path.append(ROOT_DIR)
 
+import json
+import mmap
 import random
+import struct
 import torch
 import numpy as np
 from core import config as cfg
@@ -34,6 +37,12 @@ def get_device() -> torch.device:
     return device
 
 
+def autocast(device):
+    """bf16 autocast on device when cfg.MIXED_PRECISION is on, a no-op context otherwise."""
+    device_type = device.type if isinstance(device, torch.device) else str(device)
+    return torch.autocast(device_type=device_type, dtype=torch.bfloat16, enabled=bool(cfg.MIXED_PRECISION))
+
+
 # ==============================
 # Checkpoint Management
 # ==============================
@@ -73,3 +82,132 @@ def load_checkpoint(model, optimizer=None, path: str = cfg.CHECKPOINT_PATH):
 
     print(f"✅ Loaded checkpoint from: {path}")
     return ckpt.get("epoch", 0), ckpt.get("best_metric", None)
+
+
+# ==============================
+# Slim inference weights
+# ==============================
+# safetensors layout (readable by the safetensors library, no dependency here):
+#   u64 little-endian header size | JSON header | raw little-endian tensor bytes
+# header: {name: {"dtype", "shape", "data_offsets": [begin, end]}, "__metadata__": {...}}
+
+_ST_DTYPES = {
+    torch.float32: "F32",
+    torch.float16: "F16",
+    torch.bfloat16: "BF16",
+    torch.int64: "I64",
+    torch.int32: "I32",
+    torch.uint8: "U8",
+    torch.bool: "BOOL",
+}
+_ST_TORCH = {v: k for k, v in _ST_DTYPES.items()}
+
+
+def inference_weights_path(ckpt_path: str) -> str:
+    """outputs/checkpoints/x_best.pth -> outputs/checkpoints/x_best.safetensors"""
+    return os.path.splitext(ckpt_path)[0] + ".safetensors"
+
+
+def resolve_weights_path(ckpt_path: str) -> str:
+    """
+    The file the serving path should load for ckpt_path: its slim .safetensors export
+    when present and not older than the checkpoint, else the checkpoint itself.
+    """
+    slim = inference_weights_path(ckpt_path)
+    if os.path.exists(slim) and (not os.path.exists(ckpt_path) or os.path.getmtime(slim) >= os.path.getmtime(ckpt_path)):
+        return slim
+    return ckpt_path
+
+
+def save_inference_weights(state_dict: dict, path: str, half: bool = False, metadata: dict = None):
+    """
+    Write weights only (no optimizer state) in the safetensors layout.
+    half=True stores floating-point tensors as float16 (about half the size; they are
+    cast back to float32 on load, which then costs private memory instead of shared pages).
+    """
+    tensors = {}
+    for name, t in state_dict.items():
+        t = t.detach().cpu()
+        if half and t.is_floating_point():
+            t = t.half()
+        tensors[name] = t.contiguous()
+
+    # largest element size first: every tensor stays aligned for zero-copy loading
+    names = sorted(tensors, key=lambda n: (-tensors[n].element_size(), n))
+    header, offset = {}, 0
+    for name in names:
+        t = tensors[name]
+        nbytes = t.numel() * t.element_size()
+        header[name] = {"dtype": _ST_DTYPES[t.dtype], "shape": list(t.shape), "data_offsets": [offset, offset + nbytes]}
+        offset += nbytes
+    header["__metadata__"] = {k: str(v) for k, v in (metadata or {}).items()}
+
+    header_bytes = json.dumps(header, separators=(",", ":")).encode()
+    header_bytes += b" " * (-len(header_bytes) % 8)  # data starts 8-byte aligned
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for name in names:
+            f.write(tensors[name].reshape(-1).view(torch.uint8).numpy().tobytes())
+    os.replace(tmp, path)
+    print(f"💾 Saved inference weights to: {path} ({os.path.getsize(path) / 2**20:.1f} MB)")
+
+
+def load_inference_weights(path: str) -> dict:
+    """
+    Memory-map a save_inference_weights file and return its state dict. float32 tensors
+    are views of the mapping (copy-on-write): processes loading the same file share the
+    pages, and nothing is read from disk until it is touched. float16 tensors come back
+    as float32 copies.
+    """
+    with open(path, "rb") as f:
+        header_size = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_size))
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    start = 8 + header_size
+
+    state = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = _ST_TORCH[info["dtype"]]
+        begin, end = info["data_offsets"]
+        count = (end - begin) // torch.empty((), dtype=dtype).element_size()
+        t = torch.frombuffer(buf, dtype=dtype, count=count, offset=start + begin) if count else torch.empty(0, dtype=dtype)
+        t = t.reshape(info["shape"])
+        if dtype in (torch.float16, torch.bfloat16):
+            t = t.float()
+        state[name] = t
+    return state
+
+
+def load_state_for_inference(ckpt_path: str) -> dict:
+    """model_state for ckpt_path: from its slim export if there is one, else from the checkpoint."""
+    path = resolve_weights_path(ckpt_path)
+    if path != ckpt_path:
+        return load_inference_weights(path)
+
+    try:
+        # zipfile checkpoints: tensors are mapped, only model_state's pages get read
+        state = torch.load(ckpt_path, map_location="cpu", mmap=True, weights_only=False)
+    except RuntimeError:
+        state = torch.load(ckpt_path, map_location="cpu", weights_only=False)  # legacy format
+    return state.get("model_state", state)
+
+
+def instantiate_with_state(build, state: dict):
+    """
+    Call build() on the meta device (no random init, no allocation) and adopt the
+    tensors of state as the model's parameters/buffers (no copy: mmap-backed stays mapped).
+    """
+    with torch.device("meta"):
+        model = build()
+    model.load_state_dict(state, assign=True)
+
+    missing = [n for n, t in list(model.named_parameters()) + list(model.named_buffers()) if t.is_meta]
+    if missing:
+        raise RuntimeError(f"State dict does not initialise: {missing[:5]}")
+    return model
@@ -4,9 +4,12 @@ import torchvision.models as models
 from core.config import PRETRAINED, DROPOUT, FREEZE_BACKBONE
 
 class EfficientNet13(nn.Module):
-    def __init__(self, model_name="efficientnet_b0"):
+    def __init__(self, model_name="efficientnet_b0", pretrained=None):
         """
         EfficientNet backbone for multi-output regression of 13 parameters (0-6 range)
+
+        pretrained=None falls back to config.PRETRAINED. Pass False when a checkpoint
+        will overwrite the weights anyway, to skip the ImageNet download/init.
         """
         super().__init__()
 
@@ -18,7 +21,10 @@ class EfficientNet13(nn.Module):
             "efficientnet_b3": models.EfficientNet_B3_Weights.IMAGENET1K_V1,
         }
 
-        if PRETRAINED:
+        if pretrained is None:
+            pretrained = PRETRAINED
+
+        if pretrained:
             weights = pretrained_weights.get(model_name, None)
             self.cnn = getattr(models, model_name)(weights=weights)
         else:
@@ -49,5 +55,5 @@ class EfficientNet13(nn.Module):
 # -----------------------------------------------------------
 # Helper for train.py
 # -----------------------------------------------------------
-def build_efficientnet(model_name="efficientnet_b0"):
-    return EfficientNet13(model_name=model_name)
+def build_efficientnet(model_name="efficientnet_b0", pretrained=None):
+    return EfficientNet13(model_name=model_name, pretrained=pretrained)
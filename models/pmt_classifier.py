@@ -15,7 +15,7 @@ class EfficientNetClassifier(nn.Module):
         OR use default MODEL_NAME from config.py
     """
 
-    def __init__(self, model_name: str = None, num_classes: int = 2):
+    def __init__(self, model_name: str = None, num_classes: int = 2, pretrained: bool = None):
         super().__init__()
 
         # Use passed model name OR fallback to config
@@ -33,7 +33,10 @@ class EfficientNetClassifier(nn.Module):
         }
 
         # Load backbone with or without pretrained weights
-        weights = pretrained_weights.get(base) if PRETRAINED else None
+        # (pretrained=None → config flag; False skips ImageNet init before a checkpoint load)
+        if pretrained is None:
+            pretrained = PRETRAINED
+        weights = pretrained_weights.get(base) if pretrained else None
 
         try:
             self.cnn = getattr(models, base)(weights=weights)
@@ -82,8 +85,8 @@ class EfficientNetClassifier(nn.Module):
 
 
 # Helper builder
-def build_pmt_classifier(model_name: str = None, num_classes: int = 2) -> EfficientNetClassifier:
-    return EfficientNetClassifier(model_name=model_name, num_classes=num_classes)
+def build_pmt_classifier(model_name: str = None, num_classes: int = 2, pretrained: bool = None) -> EfficientNetClassifier:
+    return EfficientNetClassifier(model_name=model_name, num_classes=num_classes, pretrained=pretrained)
 
 
 if __name__ == "__main__":